@@ -6,6 +6,7 @@ from .port import ActuatorPort, Port, SensorPort
 is_emulated = Port.is_emulated
 
 set_bit = ActuatorPort.set_bit
+set_bits = ActuatorPort.set_bits
 
 increment_sensors = SensorPort.increment_sensors
 set_sensor_event = SensorPort.set_sensor_event
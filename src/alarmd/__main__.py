@@ -18,6 +18,7 @@
 """Home security alarm daemon"""
 
 import argparse
+import signal
 import sys
 import syslog
 import os
@@ -25,24 +26,34 @@ import threading
 
 
 from alarmd.debug import Debug
-from .dsl import read_config
+from . import compiler
+from .async_runtime import AsyncRuntime
+from .event_queue import event_queue
+from .gpio import SimulatedBackend
 from .port import ActuatorPort, Port, SensorPort
 from .rest import app
+from .server import make_server
 from .state import State
 
 
-def run_rest_server():
+def run_rest_server(threads, socket_path):
     """Thread callback to run the REST server"""
-    app.run(
-        host="127.0.0.1", port=5000, debug=Debug.enabled(), use_reloader=False
-    )
+    app.debug = Debug.enabled()
+    make_server(app, threads, socket_path).serve_forever()
 
 
-def main():
-    """Program entry point"""
-    syslog.openlog(ident="alarm")
-    syslog.syslog(syslog.LOG_INFO, f"starting up: pid {os.getpid()}")
+def log_trace(_signum, _frame):
+    """Signal handler to log the recently processed events"""
+    for record in State.get_trace():
+        syslog.syslog(
+            syslog.LOG_DEBUG,
+            f"trace: {record['time']} {record['event']} "
+            f"{record['from']} > {record['to']}",
+        )
+
 
+def parse_arguments():
+    """Return the parsed command-line arguments"""
     parser = argparse.ArgumentParser(description="Security alarm daemon")
 
     parser.add_argument(
@@ -53,9 +64,79 @@ def main():
         "-e", "--emulate", help="Emulate GPIO", action="store_true"
     )
 
+    parser.add_argument(
+        "-a",
+        "--asyncio",
+        help="Run on a single asyncio event loop",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "-b",
+        "--batch",
+        help="Process queued events in batches",
+        action="store_true",
+    )
+
+    parser.add_argument(
+        "--coalesce",
+        metavar="SECONDS",
+        type=float,
+        default=0,
+        help="Coalesce identical sensor events arriving within this period",
+    )
+
+    parser.add_argument(
+        "--edge-buffer",
+        metavar="N",
+        type=int,
+        default=64,
+        help="Read and queue up to N GPIO edge events at once",
+    )
+
+    parser.add_argument(
+        "--simulate-rate",
+        metavar="HZ",
+        type=float,
+        default=0,
+        help="Simulate GPIO, pulsing each sensor at random HZ times a second",
+    )
+
+    parser.add_argument(
+        "--simulate-script",
+        metavar="FILE",
+        help="Simulate GPIO, changing sensor values as specified in FILE",
+    )
+
+    parser.add_argument(
+        "--status-file",
+        metavar="FILE",
+        help="Write the sensors' status to FILE, rather than marker files",
+    )
+
+    parser.add_argument(
+        "--threads",
+        metavar="N",
+        type=int,
+        default=8,
+        help="Serve REST requests on N threads",
+    )
+
+    parser.add_argument(
+        "--socket",
+        metavar="PATH",
+        help="Serve REST requests on a Unix domain socket, rather than TCP",
+    )
+
     parser.add_argument("file", help="Alarm specification", type=str)
 
     group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        "-c",
+        "--compile",
+        action="store_true",
+        help="Compile the specification into a cached Python module",
+    )
     group.add_argument(
         "-l", "--list", action="store_true", help="List available ports"
     )
@@ -69,16 +150,38 @@ def main():
         "-v", "--values", action="store_true", help="Show sensor values"
     )
 
-    args = parser.parse_args()
+    return parser.parse_args()
+
+
+def main():
+    """Program entry point"""
+    syslog.openlog(ident="alarm")
+    syslog.syslog(syslog.LOG_INFO, f"starting up: pid {os.getpid()}")
+
+    args = parse_arguments()
     if args.debug:
         Debug.enable()
 
     if args.emulate:
         Port.set_emulated(True)
 
+    if args.simulate_rate or args.simulate_script:
+        script = None
+        if args.simulate_script:
+            with open(args.simulate_script, encoding="utf-8") as script_file:
+                script = SimulatedBackend.read_script(script_file)
+        Port.set_backend(SimulatedBackend(args.simulate_rate, script))
+
+    event_queue.set_coalescing_window(args.coalesce)
+    Port.set_edge_buffer_size(args.edge_buffer)
+    Port.set_status_path(args.status_file)
+
+    if args.compile:
+        compiler.main(args.file)
+        sys.exit(0)
+
     # Read description file to setup I/O hardware
-    with open(args.file, "r", encoding="utf-8") as input_file:
-        initial_state_name = read_config(input_file)
+    initial_state_name = compiler.load_config(args.file)
 
     if args.values:
         SensorPort.sensor_display()
@@ -93,14 +196,21 @@ def main():
         Port.list_ports()
         sys.exit(0)
 
+    signal.signal(signal.SIGUSR1, log_trace)
+
+    if args.asyncio:
+        with Port.request_lines(watch=False):
+            AsyncRuntime(app).run(initial_state_name, Port.requests)
+        sys.exit(0)
+
     # Start Flask in a separate thread
-    flask_thread = threading.Thread(target=run_rest_server, daemon=True)
+    flask_thread = threading.Thread(
+        target=run_rest_server, args=(args.threads, args.socket), daemon=True
+    )
     flask_thread.start()
 
-    # Pylint can't recognize it, but dir() shows __enter__, and __exit__.
-    # pylint: disable-next=not-context-manager
     with Port.request_lines():
-        State.event_processor(initial_state_name)
+        State.event_processor(initial_state_name, batching=args.batch)
 
 
 if __name__ == "__main__":
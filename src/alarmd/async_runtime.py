@@ -0,0 +1,290 @@
+"""
+Run the alarm daemon on a single asyncio event loop.
+GPIO edge events, timers, REST requests, and event dispatch are all
+handled on the loop; entry actions, which may take long to complete,
+are performed in order by a single worker thread.
+"""
+
+import asyncio
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from time import monotonic
+from urllib.parse import unquote
+
+from alarmd.debug import Debug
+from .event_queue import event_queue
+from .port import SensorPort
+from .state import State
+from .timer import timer_scheduler
+
+
+class AsyncWSGIServer:
+    """
+    A minimal HTTP/1.1 server running a WSGI application on an asyncio
+    event loop.
+    It is intended for the daemon's short-running REST requests,
+    which are served directly on the loop.
+    """
+
+    def __init__(self, app, host, port):
+        """
+        Initialize the server.
+
+        Args:
+            app (callable): The WSGI application to serve.
+            host (str): The address on which to listen.
+            port (int): The port on which to listen; 0 for any.
+        """
+        self.app = app
+        self.host = host
+        self.port = port
+        self.server = None
+
+    async def start(self):
+        """Start listening for connections."""
+        self.server = await asyncio.start_server(
+            self.handle_connection, self.host, self.port
+        )
+
+    def get_address(self):
+        """Return the (host, port) address the server listens on."""
+        return self.server.sockets[0].getsockname()[:2]
+
+    def close(self):
+        """Stop listening for connections."""
+        if self.server:
+            self.server.close()
+
+    async def handle_connection(self, reader, writer):
+        """Serve the requests arriving on a connection."""
+        try:
+            while await self.handle_request(reader, writer):
+                pass
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(self, reader, writer):
+        """
+        Serve a single HTTP request.
+
+        Returns:
+            bool: True if the connection shall be kept open.
+        """
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return False
+        method, target, version = request_line.decode("latin-1").split()
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        body = await reader.readexactly(length) if length else b""
+
+        environ = self.make_environ(
+            method, target, version, headers, body, writer
+        )
+        keep_alive = version == "HTTP/1.1" and (
+            headers.get("connection", "").lower() != "close"
+        )
+        writer.write(self.call_app(environ, keep_alive))
+        await writer.drain()
+        return keep_alive
+
+    def call_app(self, environ, keep_alive):
+        """
+        Call the WSGI application with the specified environment.
+
+        Returns:
+            bytes: The HTTP response.
+        """
+        response = {}
+
+        def start_response(status, response_headers, _exc_info=None):
+            response["status"] = status
+            response["headers"] = response_headers
+
+        result = self.app(environ, start_response)
+        try:
+            content = b"".join(result)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+
+        head = [f"HTTP/1.1 {response['status']}"]
+        for name, value in response["headers"]:
+            if name.lower() not in ("content-length", "connection"):
+                head.append(f"{name}: {value}")
+        head.append(f"Content-Length: {len(content)}")
+        head.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        return ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + content
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def make_environ(self, method, target, version, headers, body, writer):
+        """Return the WSGI environment for the specified request."""
+        path, _, query = target.partition("?")
+        peer = writer.get_extra_info("peername") or ("", 0)
+        environ = {
+            "REQUEST_METHOD": method,
+            "SCRIPT_NAME": "",
+            "PATH_INFO": unquote(path, "latin-1"),
+            "QUERY_STRING": query,
+            "SERVER_NAME": str(self.host),
+            "SERVER_PORT": str(self.port),
+            "SERVER_PROTOCOL": version,
+            "REMOTE_ADDR": peer[0],
+            "REMOTE_PORT": str(peer[1]),
+            "CONTENT_TYPE": headers.get("content-type", ""),
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": False,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in headers.items():
+            key = "HTTP_" + name.upper().replace("-", "_")
+            if key not in ("HTTP_CONTENT_TYPE", "HTTP_CONTENT_LENGTH"):
+                environ[key] = value
+        return environ
+
+
+class AsyncRuntime:
+    """
+    Run the state machine and its event sources on an asyncio event loop.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, app, host="127.0.0.1", port=5000):
+        """
+        Initialize the runtime.
+
+        Args:
+            app (callable): The WSGI application serving REST requests.
+            host (str): The address on which to serve REST requests.
+            port (int): The port on which to serve REST requests.
+        """
+        self.http_server = AsyncWSGIServer(app, host, port)
+        self.loop = None
+        # Set when events may be available in the event queue
+        self.events_ready = asyncio.Event()
+        self.wakeup_pending = False
+        # Set when the runtime is ready to accept events
+        self.started = asyncio.Event()
+        self.timer_handle = None
+        # Entry actions are performed in order by a single thread
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="actions"
+        )
+
+    def run(self, initial_state_name, requests=None):
+        """
+        Run the state machine until it reaches the DONE state.
+
+        Args:
+            initial_state_name (str): The state from which to start.
+            requests (dict): Map from chip paths to the LineRequest
+                objects whose GPIO edge events to monitor; None for none.
+
+        Returns:
+            None
+        """
+        asyncio.run(self.main(initial_state_name, requests))
+
+    async def main(self, initial_state_name, requests=None):
+        """Coroutine implementing run()."""
+        self.loop = asyncio.get_running_loop()
+        event_queue.set_waker(self.wake)
+        timer_scheduler.set_waker(
+            lambda: self.loop.call_soon_threadsafe(self.run_timers)
+        )
+        requests = requests or {}
+        for chip, request in requests.items():
+            self.loop.add_reader(
+                request.fd, self.read_edge_events, request, chip
+            )
+        try:
+            await self.http_server.start()
+            self.started.set()
+            await self.process_events(initial_state_name)
+        finally:
+            for request in requests.values():
+                self.loop.remove_reader(request.fd)
+            self.http_server.close()
+            event_queue.set_waker(None)
+            timer_scheduler.set_waker(None)
+            if self.timer_handle:
+                self.timer_handle.cancel()
+            self.executor.shutdown(wait=False)
+
+    def wake(self):
+        """
+        Wake up the event processor; may be called from any thread.
+        Called by the event queue with its lock held.
+        """
+        if not self.wakeup_pending:
+            self.wakeup_pending = True
+            self.loop.call_soon_threadsafe(self.events_ready.set)
+
+    def read_edge_events(self, request, chip):
+        """Loop callback for handling available GPIO edge events."""
+        SensorPort.handle_edge_events(
+            request.read_edge_events(SensorPort.edge_buffer_size), chip
+        )
+
+    def run_timers(self):
+        """Loop callback for delivering the expired timer events."""
+        if self.timer_handle:
+            self.timer_handle.cancel()
+            self.timer_handle = None
+        with timer_scheduler.condition:
+            events, deadline = timer_scheduler.expire(monotonic())
+        for event_name in events:
+            event_queue.put(event_name)
+        if deadline is not None:
+            # The loop's clock is the monotonic one
+            self.timer_handle = self.loop.call_at(deadline, self.run_timers)
+
+    async def enter(self, state):
+        """Perform the specified state's entry actions off the loop."""
+        await self.loop.run_in_executor(self.executor, state.enter)
+
+    async def process_events(self, initial_state_name):
+        """
+        Process events through the configured state machine,
+        starting from the specified initial state.
+        """
+        State.state = State.get_instance_by_name(initial_state_name)
+        await self.enter(State.state)
+        done = State.states_by_name.get("DONE")
+
+        batch = deque()
+        Debug.log("Starting asyncio event processing loop...")
+        while State.state is not done:
+            if State.state.direct_transition is not None:
+                event = None
+            else:
+                while not batch:
+                    self.wakeup_pending = False
+                    self.events_ready.clear()
+                    batch.extend(event_queue.get_all(block=False))
+                    if not batch:
+                        await self.events_ready.wait()
+                event = batch.popleft()
+            new_state = State.handle_event(event)
+            if new_state is not None:
+                await self.enter(new_state)
+
+        # Leave unprocessed events for a subsequent invocation
+        event_queue.unget_all(list(batch))
@@ -0,0 +1,374 @@
+"""
+Benchmark the alarm daemon's performance-critical paths.
+The benchmarks run with emulated GPIO, so no hardware is required.
+Results are written as JSON, for comparing releases.
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+from datetime import datetime, timezone
+from io import StringIO
+from time import perf_counter, sleep
+
+from werkzeug.serving import ThreadedWSGIServer
+
+from . import compiler
+from .dsl import read_config
+from .event_queue import event_queue
+from .gpio import SimulatedBackend
+from .port import Port, SensorPort
+from .rest import app
+from .server import PooledWSGIServer
+from .state import State
+from .timer import timer_scheduler
+
+# Preamble of the synthetic configurations
+PREAMBLE = """
+%{
+from alarmd import set_bit, set_sensor_event, increment_sensors, zero_sensors
+%}
+
+%i initial
+
+DONE:
+    ;
+"""
+
+
+def synthetic_config(n_states, n_events=10, n_sensors=16, n_actions=3):
+    """
+    Return the text of a synthetic alarm configuration.
+
+    Args:
+        n_states (int): The number of states to generate.
+        n_events (int): The number of distinct events per state.
+        n_sensors (int): The number of sensor ports to generate.
+        n_actions (int): The number of entry actions per state.
+
+    Returns:
+        str: The configuration's text.
+    """
+    lines = [PREAMBLE]
+    for i in range(n_sensors):
+        lines.append(f"SENSOR\tS{i:02d}\t{i}\t{i}\t1\tSensor{i}")
+    lines.append(f"ACTUATOR\tA1\t{n_sensors}\t{n_sensors}\t1\tSiren")
+    lines.append("*:\n    CmdDisarm > initial\n    CmdQuit > DONE\n    ;")
+    lines.append("initial:\n    ping > state0\n    done > DONE\n    ;")
+    for i in range(n_states):
+        lines.append(f"state{i}:")
+        for j in range(n_actions):
+            lines.append(f"    | set_bit('Siren', {j % 2})")
+        lines.append(
+            f"    |=1 set_sensor_event('Sensor{i % n_sensors}', None)"
+        )
+        for j in range(n_events):
+            lines.append(f"    event{j} > state{(i + j + 1) % n_states}")
+        lines.append("    ping > initial")
+        lines.append("    10s > initial")
+        lines.append("    ;")
+    return "\n".join(lines) + "\n"
+
+
+def load(text):
+    """Reset the daemon's state and read the specified configuration."""
+    State.reset()
+    Port.reset()
+    Port.set_emulated(True)
+    event_queue.reset()
+    timer_scheduler.reset()
+    return read_config(StringIO(text))
+
+
+def summarize(samples):
+    """
+    Return summary statistics of the specified timing samples.
+
+    Args:
+        samples (list): Measured durations in seconds.
+
+    Returns:
+        dict: Count, mean, median, 99th percentile and maximum in
+            microseconds.
+    """
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean_us": statistics.fmean(ordered) * 1e6,
+        "median_us": statistics.median(ordered) * 1e6,
+        "p99_us": ordered[int(len(ordered) * 0.99) - 1] * 1e6,
+        "max_us": ordered[-1] * 1e6,
+    }
+
+
+def bench_parse(sizes, repeat):
+    """
+    Measure read_config time for configurations of increasing size,
+    and the time to load the corresponding compiled configurations.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for n_states in sizes:
+            text = synthetic_config(n_states)
+            samples = []
+            for _ in range(repeat):
+                start = perf_counter()
+                load(text)
+                samples.append(perf_counter() - start)
+
+            path = os.path.join(directory, f"synthetic{n_states}.alr")
+            with open(path, "w", encoding="utf-8") as config:
+                config.write(text)
+            compiler.compile_config(path)
+            compiled_samples = []
+            for _ in range(repeat):
+                load("")
+                start = perf_counter()
+                compiler.load_config(path)
+                compiled_samples.append(perf_counter() - start)
+
+            results.append(
+                {
+                    "states": n_states,
+                    "lines": text.count("\n"),
+                    "seconds": min(samples),
+                    "compiled_seconds": min(compiled_samples),
+                }
+            )
+    return results
+
+
+def bench_events(n_events, batching):
+    """Measure events per second through the event processor."""
+    load(synthetic_config(100))
+    for i in range(n_events):
+        event_queue.put(f"event{i % 10}")
+    event_queue.put("CmdQuit")
+    start = perf_counter()
+    State.event_processor("state0", batching=batching)
+    elapsed = perf_counter() - start
+    return {
+        "events": n_events,
+        "batching": batching,
+        "seconds": elapsed,
+        "events_per_second": n_events / elapsed,
+    }
+
+
+def bench_enter(n_actions, repeat):
+    """Measure the latency of entering an action-heavy state."""
+    load(synthetic_config(1, n_actions=n_actions))
+    state = State.get_instance_by_name("state0")
+    samples = []
+    for _ in range(repeat):
+        start = perf_counter()
+        state.enter()
+        samples.append(perf_counter() - start)
+    return {"actions": n_actions + 1} | summarize(samples)
+
+
+def bench_rest(repeat):
+    """Measure the round-trip latency of the REST endpoints."""
+    load(synthetic_config(10))
+    State.state = State.get_instance_by_name("initial")
+    results = {}
+    with app.test_client() as client:
+        for url in ["/state", "/sensor/Sensor0", "/cmd/Disarm"]:
+            samples = []
+            for _ in range(repeat):
+                start = perf_counter()
+                response = client.get(url)
+                samples.append(perf_counter() - start)
+                assert response.status_code == 200, url
+            results[url] = summarize(samples)
+    event_queue.reset()
+    return results
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """An HTTP client connection over a Unix domain socket."""
+
+    def __init__(self, path):
+        super().__init__("localhost")
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+def bench_rest_server(server, n_clients, n_requests):
+    """
+    Measure the requests per second a REST server handles for
+    concurrent clients, each connecting anew for every request,
+    as polling clients do.
+
+    Args:
+        server (BaseWSGIServer): The server to measure, bound and
+            listening; it is closed at the end.
+        n_clients (int): The number of concurrent clients.
+        n_requests (int): The number of requests each client makes.
+    """
+    load(synthetic_config(10))
+    State.state = State.get_instance_by_name("initial")
+    if server.address_family == socket.AF_UNIX:
+
+        def connect():
+            return UnixHTTPConnection(server.server_address)
+
+    else:
+
+        def connect():
+            return http.client.HTTPConnection(server.host, server.port)
+
+    def client():
+        for _ in range(n_requests):
+            connection = connect()
+            connection.request("GET", "/state")
+            response = connection.getresponse()
+            response.read()
+            connection.close()
+            assert response.status == 200
+
+    server_thread = threading.Thread(target=server.serve_forever)
+    server_thread.start()
+    clients = [threading.Thread(target=client) for _ in range(n_clients)]
+    start = perf_counter()
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = perf_counter() - start
+    server.shutdown()
+    server_thread.join()
+    server.server_close()
+    return {
+        "server": type(server).__name__,
+        "socket": "unix" if server.address_family == socket.AF_UNIX else "tcp",
+        "clients": n_clients,
+        "requests": n_clients * n_requests,
+        "requests_per_second": n_clients * n_requests / elapsed,
+    }
+
+
+def bench_rest_servers(n_clients, n_requests, threads=8):
+    """
+    Compare the requests per second of the thread-per-request server
+    Flask's development server runs, with those of the pooled server,
+    over TCP and over a Unix domain socket.
+    """
+    # Don't measure the logging of each request
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as directory:
+        return [
+            bench_rest_server(server, n_clients, n_requests)
+            for server in [
+                ThreadedWSGIServer("127.0.0.1", 0, app),
+                PooledWSGIServer("127.0.0.1", 0, app, threads),
+                PooledWSGIServer(
+                    f"unix://{os.path.join(directory, 'alarm.sock')}",
+                    0,
+                    app,
+                    threads,
+                ),
+            ]
+        ]
+
+
+def bench_simulated(rate, duration):
+    """
+    Measure the rate at which edge events of simulated chips are
+    handled by the GPIO watcher thread.
+
+    Args:
+        rate (float): The average number of pulses per second
+            on each of the 16 sensors.
+        duration (float): The seconds to run for.
+    """
+    load(synthetic_config(10))
+    Port.set_emulated(False)
+    # Short pulses, so that they rarely overlap
+    backend = SimulatedBackend(rate, pulse_width=1e-5, seed=1)
+    Port.set_backend(backend)
+    SensorPort.set_sensor_event("*", "ping")
+    with Port.request_lines():
+        sleep(duration)
+    handled = len(event_queue.get_all(block=False))
+    lost = sum(request.overflows for request in backend.requests)
+    total_rate = rate * len(SensorPort.sensors)
+    load("")
+    return {
+        "rate": total_rate,
+        "seconds": duration,
+        "handled": handled,
+        "lost": lost,
+        "edges_per_second": handled / duration,
+    }
+
+
+def run(quick=False):
+    """
+    Run all benchmarks.
+
+    Args:
+        quick (bool): True to run a shorter version, e.g. for testing.
+
+    Returns:
+        dict: The benchmark results and the environment they were
+            obtained in.
+    """
+    scale = 10 if quick else 1
+    sizes = [10, 100] if quick else [10, 100, 1000, 5000]
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "results": {
+            "parse": bench_parse(sizes, repeat=3),
+            "events": [
+                bench_events(100_000 // scale, batching=False),
+                bench_events(100_000 // scale, batching=True),
+            ],
+            "enter": [
+                bench_enter(n, repeat=10_000 // scale) for n in [1, 10, 50]
+            ],
+            "rest": bench_rest(repeat=1000 // scale),
+            "rest_server": bench_rest_servers(8, 1000 // scale),
+            "simulated": bench_simulated(1000 / 16, duration=10 / scale),
+        },
+    }
+
+
+def main():
+    """Program entry point"""
+    parser = argparse.ArgumentParser(
+        description="Alarm daemon performance benchmarks"
+    )
+    parser.add_argument(
+        "-o", "--output", metavar="FILE", help="Write results to FILE"
+    )
+    parser.add_argument(
+        "-q", "--quick", action="store_true", help="Run shorter benchmarks"
+    )
+    args = parser.parse_args()
+
+    results = run(quick=args.quick)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Fan-out of state machine messages to streaming REST clients."""
+
+import itertools
+import threading
+from collections import deque
+
+
+class Broadcaster:
+    """
+    Distribute numbered messages to any number of subscribers.
+    Messages are kept in a bounded history, from which each subscriber
+    fetches those following the last one it received, so publishing
+    never waits for subscribers, however slow, and reconnecting ones
+    can resume where they left off.
+    """
+
+    def __init__(self, history=256):
+        """
+        Initialize the broadcaster.
+
+        Args:
+            history (int): The number of recent messages to keep.
+        """
+        self.condition = threading.Condition()
+        # (sequence number, kind, data) tuples of the recent messages
+        self.messages = deque(maxlen=history)
+        # Sequence number of the last published message
+        self.sequence = 0
+
+    def reset(self):
+        """Discard all messages, restarting their numbering."""
+        with self.condition:
+            self.messages.clear()
+            self.sequence = 0
+
+    def publish(self, kind, data):
+        """
+        Publish a message to all subscribers.
+
+        Args:
+            kind (str): The message's kind, e.g. "transition".
+            data (dict): The message's JSON-serializable data.
+
+        Returns:
+            int: The message's sequence number.
+        """
+        with self.condition:
+            self.sequence += 1
+            self.messages.append((self.sequence, kind, data))
+            self.condition.notify_all()
+            return self.sequence
+
+    def get_sequence(self):
+        """Return the sequence number of the last published message."""
+        return self.sequence
+
+    def get_messages(self, after, timeout=None):
+        """
+        Return the messages published after the specified one,
+        waiting for one to be published if there are none.
+        Messages that have left the history are skipped, which
+        subscribers can detect through the sequence numbers' gap.
+
+        Args:
+            after (int): The sequence number of the last message
+                received; 0 for all those in the history.
+            timeout (float): The maximum seconds to wait;
+                None to wait indefinitely.
+
+        Returns:
+            list: The (sequence number, kind, data) tuples of the
+                messages, empty if the timeout expired.
+        """
+        with self.condition:
+            # Numbering restarted, e.g. with the daemon
+            if after > self.sequence:
+                after = 0
+            self.condition.wait_for(lambda: self.sequence > after, timeout)
+            if not self.messages:
+                return []
+            first = self.messages[0][0]
+            return list(
+                itertools.islice(
+                    self.messages, max(0, after + 1 - first), None
+                )
+            )
+
+
+# The global broadcaster of state machine messages
+broadcaster = Broadcaster()
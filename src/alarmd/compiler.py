@@ -0,0 +1,232 @@
+"""
+Compile alarm configuration files into cached Python modules.
+A compiled configuration is a Python module, stored next to its source,
+that sets up the ports and states without parsing the DSL.
+It is executed in the namespace of the DSL's Python blocks,
+and its bytecode is cached by Python's import machinery,
+so loading a valid compiled configuration involves no parsing.
+"""
+
+import hashlib
+import os
+import py_compile
+import sys
+from importlib.machinery import SourceFileLoader
+from io import StringIO
+
+from .dsl import read_config
+from .port import Port
+from .state import State
+from .state import __dict__ as state_dict
+
+# Increment when the generated code changes in incompatible ways
+FORMAT_VERSION = 3
+
+
+def get_cache_path(source_path):
+    """Return the path of the compiled module for the specified source."""
+    return source_path + ".py"
+
+
+def get_header(source):
+    """
+    Return the first line of the module compiled from the specified source.
+    It identifies the source from which the module was compiled.
+
+    Args:
+        source (bytes): The configuration's source code.
+
+    Returns:
+        str: The header line, including a newline.
+    """
+    digest = hashlib.sha256(source).hexdigest()
+    return f"# alarmd compiled configuration v{FORMAT_VERSION} {digest}\n"
+
+
+def generate_ports():
+    """
+    Return the code lines that recreate the currently configured ports.
+
+    Returns:
+        list: The indented code lines.
+    """
+    lines = [
+        "    from alarmd.port import ActuatorPort",
+        "    from alarmd.port import SensorPort",
+    ]
+    for port in Port.ports:
+        if port.is_sensor():
+            arguments = (
+                port.name,
+                port.pcb,
+                port.physical,
+                port.bcm,
+                port.is_always_logging(),
+                port.chip,
+                port.debounce,
+                port.edge,
+                port.get_min_pulse(),
+                port.get_holdoff(),
+            )
+            lines.append(f"    SensorPort{arguments!r}")
+        else:
+            arguments = (
+                port.name,
+                port.pcb,
+                port.physical,
+                port.bcm,
+                0,
+                port.chip,
+            )
+            lines.append(f"    ActuatorPort{arguments!r}")
+    return lines
+
+
+def generate(header, source_name, initial_state_name, python_blocks):
+    """
+    Return the source code of the module that reproduces the
+    currently configured ports and states.
+
+    Args:
+        header (str): The module's first line.
+        source_name (str): The name of the configuration file.
+        initial_state_name (str): The name of the state to start from.
+        python_blocks (list): (line number, code) tuples of the
+            configuration's Python blocks.
+
+    Returns:
+        str: The module's source code.
+    """
+    lines = [
+        header.rstrip("\n"),
+        f'"""Alarm configuration compiled from {source_name}; do not edit."""',
+        "# pylint: skip-file",
+    ]
+    for line_number, code in python_blocks:
+        lines += ["", f"# {source_name}({line_number})", code]
+
+    load = ["def _alr_load():"] + generate_ports()
+    for state_number, state in enumerate(State.states_by_name.values()):
+        if state is State.all_states:
+            load.append("    state = State.all_states")
+        else:
+            load.append(f"    state = State({state.name!r})")
+        functions = []
+        for action_number, command in enumerate(state.entry_actions):
+            function_name = f"_alr_action_{state_number}_{action_number}"
+            lines += [
+                "",
+                "",
+                f"def {function_name}(self):",
+                "    return (",
+                f"        {command}",
+                "    )",
+            ]
+            functions.append(function_name)
+        load.append(f"    state.entry_actions = {state.entry_actions!r}")
+        load.append(f"    state.entry_functions = [{', '.join(functions)}]")
+        load.append(
+            f"    state.event_transitions = {state.event_transitions!r}"
+        )
+    load.append("    State.finalize()")
+    load.append(f"    return {initial_state_name!r}")
+
+    lines += ["", ""] + load
+    lines += ["", "", "_alr_initial_state_name = _alr_load()", ""]
+    return "\n".join(lines)
+
+
+def compile_config(source_path):
+    """
+    Compile the specified configuration file into a module stored
+    next to it.
+    As a side effect, the configuration is also read.
+
+    Args:
+        source_path (str): The path of the configuration file.
+
+    Returns:
+        str: The path of the compiled module.
+    """
+    with open(source_path, "rb") as source_file:
+        source = source_file.read()
+
+    input_file = StringIO(source.decode("utf-8"))
+    input_file.name = source_path
+    python_blocks = []
+    initial_state_name = read_config(input_file, python_blocks)
+
+    cache_path = get_cache_path(source_path)
+    code = generate(
+        get_header(source),
+        os.path.basename(source_path),
+        initial_state_name,
+        python_blocks,
+    )
+    # Write-then-rename, so that a concurrent load never sees a partial file
+    temporary_path = cache_path + ".tmp"
+    with open(temporary_path, "w", encoding="utf-8") as output:
+        output.write(code)
+    os.replace(temporary_path, cache_path)
+    # Cache the bytecode now, even if Python is set not to write it
+    py_compile.compile(cache_path, doraise=True)
+    return cache_path
+
+
+def load_compiled(source_path):
+    """
+    Set up the ports and states from the compiled module of the
+    specified configuration file, if it is still valid.
+
+    Args:
+        source_path (str): The path of the configuration file.
+
+    Returns:
+        tuple: True and the name of the state from which to start,
+            or False and None if there is no valid compiled module.
+    """
+    cache_path = get_cache_path(source_path)
+    try:
+        with open(source_path, "rb") as source_file:
+            header = get_header(source_file.read())
+        with open(cache_path, "r", encoding="utf-8") as cache_file:
+            if cache_file.readline() != header:
+                return False, None
+    except FileNotFoundError:
+        return False, None
+
+    # Use the bytecode cached in __pycache__ when it is up to date
+    loader = SourceFileLoader("alarmd_config", cache_path)
+    code = loader.get_code("alarmd_config")
+    # pylint: disable-next=exec-used
+    exec(code, state_dict)
+    return True, state_dict.pop("_alr_initial_state_name")
+
+
+def load_config(source_path):
+    """
+    Read the specified alarm configuration file, setting up the hardware
+    and the event-processing state transition rules.
+    Use the compiled module when it is valid.
+
+    Args:
+        source_path (str): The path of the configuration file.
+
+    Returns:
+        str: The name of the state from which to start.
+    """
+    valid, initial_state_name = load_compiled(source_path)
+    if valid:
+        return initial_state_name
+    with open(source_path, "r", encoding="utf-8") as input_file:
+        return read_config(input_file)
+
+
+def main(source_path):
+    """Compile the specified configuration, exiting on errors."""
+    try:
+        cache_path = compile_config(source_path)
+    except OSError as exc:
+        sys.stderr.write(f"{source_path}: {exc}\n")
+        sys.exit(1)
+    print(f"Compiled {source_path} into {cache_path}")
@@ -31,11 +31,14 @@ class Debug:
     def log(cls, *args):
         """
         Logs a debug message with functionality similar to the print function.
+        Callable arguments are called to obtain the object to log, so that
+        expensive messages can be formatted only when logging is enabled,
+        e.g. Debug.log(lambda: f"{state=}").
 
         Args:
             *args: The objects to be logged, separated by `sep`.
         """
-        if not cls.enabled():
+        if not cls.logging:
             return
-        message = " ".join(map(str, args))
+        message = " ".join(str(a() if callable(a) else a) for a in args)
         print(message, file=sys.stderr, flush=True)
@@ -0,0 +1,218 @@
+"""Cache of the sensors disabled by the user through marker files."""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+
+DISABLEPATH = "/var/spool/alarm/disable/"
+
+# See inotify(7)
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_CREATE
+    | IN_DELETE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+)
+
+# struct inotify_event header: wd, mask, cookie, len
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def get_libc():
+    """Return the C library, or None if it lacks inotify support."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_uint32,
+        ]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class DisabledSensors:
+    """
+    The names of the files in a directory, each disabling the sensor
+    with the same name.
+    The names are kept in memory, and are updated incrementally from
+    inotify notifications on the directory by a dedicated thread.
+    The thread also rescans the directory periodically, in case
+    notifications are lost or inotify is unavailable.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, path, rescan_interval=60):
+        """
+        Initialize the cache.
+
+        Args:
+            path (str): The directory containing the marker files.
+            rescan_interval (float): Seconds between directory rescans.
+        """
+        self.path = path
+        self.rescan_interval = rescan_interval
+        # Replaced as a whole, so readers need no lock
+        self.names = frozenset()
+        self.thread = None
+        self.libc = None
+        # inotify file descriptor and watch descriptor, or None
+        self.inotify_fd = None
+        self.watch = None
+        self.rescans = 0
+        self.notifications = 0
+
+    def start(self):
+        """
+        Scan the directory and start the thread that keeps the cache
+        up to date; do nothing if already started.
+        """
+        if self.thread:
+            return
+        self.libc = get_libc()
+        if self.libc:
+            fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            self.inotify_fd = fd if fd >= 0 else None
+        self.add_watch()
+        self.rescan()
+        self.thread = threading.Thread(
+            target=self.run, daemon=True, name="disabled"
+        )
+        self.thread.start()
+
+    def add_watch(self):
+        """
+        Watch the directory for changes through inotify, if possible.
+
+        Returns:
+            bool: True if the directory is being watched.
+        """
+        if self.inotify_fd is not None and self.watch is None:
+            wd = self.libc.inotify_add_watch(
+                self.inotify_fd, os.fsencode(self.path), WATCH_MASK
+            )
+            # Fails if the directory doesn't (yet) exist
+            self.watch = wd if wd >= 0 else None
+        return self.watch is not None
+
+    def rescan(self):
+        """Set the cached names to those of the directory's files."""
+        try:
+            self.names = frozenset(os.listdir(self.path))
+        except OSError:
+            self.names = frozenset()
+        self.rescans += 1
+
+    def run(self):
+        """Thread function keeping the cache up to date."""
+        while True:
+            if self.watch is None:
+                time.sleep(self.rescan_interval)
+                if self.add_watch():
+                    # Catch changes made before the watch was added
+                    self.rescan()
+                    continue
+            else:
+                readable, _, _ = select.select(
+                    [self.inotify_fd], [], [], self.rescan_interval
+                )
+                if readable:
+                    try:
+                        data = os.read(self.inotify_fd, 64 * 1024)
+                    except BlockingIOError:
+                        continue
+                    self.handle_notifications(data)
+                    continue
+            self.rescan()
+
+    def handle_notifications(self, data):
+        """
+        Update the cache according to the specified inotify events.
+
+        Args:
+            data (bytes): Data read from the inotify file descriptor.
+
+        Returns:
+            None
+        """
+        names = set(self.names)
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            self.notifications += 1
+
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                names.add(name)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                names.discard(name)
+            elif mask & IN_Q_OVERFLOW:
+                # Events were lost
+                self.rescan()
+                names = set(self.names)
+            elif mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                # The directory is gone; wait for it to be recreated
+                self.watch = None
+                names.clear()
+        self.names = frozenset(names)
+
+    def is_disabled(self, name):
+        """
+        Return True if the specified sensor is disabled.
+        If the cache isn't running, the directory is checked directly.
+
+        Args:
+            name (str): The sensor's name.
+
+        Returns:
+            bool: True if the sensor's marker file exists.
+        """
+        if not self.thread:
+            return os.path.exists(os.path.join(self.path, name))
+        return name in self.names
+
+    def get_names(self):
+        """Return the sorted names of the disabled sensors."""
+        if not self.thread:
+            self.rescan()
+        return sorted(self.names)
+
+    def get_counters(self):
+        """
+        Return the cache's counters.
+
+        Returns:
+            dict: The number of directory rescans and of processed
+                inotify notifications, and whether the directory is
+                watched through inotify.
+        """
+        return {
+            "rescans": self.rescans,
+            "notifications": self.notifications,
+            "watched": self.watch is not None,
+        }
+
+
+disabled_sensors = DisabledSensors(DISABLEPATH)
@@ -1,139 +1,482 @@
 """
 Parse alarm configuration domain-specific language.
+Parsing happens in a single pass over the input.
+Each line is classified as a token by a single master regular expression,
+and the tokens are parsed into an abstract syntax tree (AST),
+whose nodes record their line numbers.
+The AST is then used to set up the hardware and the state machine.
+Errors are collected in all phases and reported together.
 """
 
 import re
 import sys
+import traceback
+from collections import namedtuple
 
-from .port import SensorPort, ActuatorPort
+from .gpio import get_chip_path
+from .port import EDGES, SensorPort, ActuatorPort
 
 from .state import State
 from .state import __dict__ as state_dict
 
+# Each alternative matches a complete line of one kind of token;
+# the name of the matched alternative is the token's kind.
+# As in earlier versions, a transition may be followed by a
+# (redundant) semicolon and a comment, which are ignored.
+LINE_PATTERN = re.compile(
+    r"""
+      (?P<blank>\s*(?:\#.*)?)
+    | (?P<port>(?P<port_type>SENSOR|ACTUATOR)
+        \s+(?P<pcb>\S+)\s+(?P<physical>\d+)\s+(?P<bcm>\d+)
+        \s+(?P<log>\S+)\s+(?P<port_name>[^\s=]+)
+        (?P<options>(?:\s+\w+=\S+)*))
+    | (?P<bad_port>(?:SENSOR|ACTUATOR)\b.*)
+    | (?P<python_begin>%\{)
+    | (?P<initial>%i\s+(?P<initial_name>\w+))
+    | (?P<state>(?P<state_name>\w+|\*):)
+    | (?P<action>\s*\|(?P<count>[=><]\d+)?\s+(?P<command>.*))
+    | (?P<transition>\s*(?P<event>[\w.]+)?\s*>\s*(?P<target>\w+)
+        \s*;?\s*(?:\#.*)?)
+    | (?P<end>\s*;)
+    """,
+    re.VERBOSE,
+)
 
-def read_config(input_file):
-    """Read the alarm configuration file, setting up the hardware and
-    the event-processing state transition rules.
+# Durations, e.g. of port options, in seconds or milliseconds
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d*)?|\.\d+)(s|ms)")
+
+
+def get_duration(text):
+    """
+    Return the seconds of the specified duration, e.g. 1.5s or 200ms.
+
+    Raises:
+        ValueError: If the text is not a valid duration.
+    """
+    match = DURATION_PATTERN.fullmatch(text)
+    if not match:
+        raise ValueError(f"invalid duration {text}")
+    seconds = float(match.group(1))
+    return seconds / 1000 if match.group(2) == "ms" else seconds
+
+
+def get_edge(text):
+    """
+    Return the specified edge name, after checking its validity.
+
+    Raises:
+        ValueError: If the text is not an edge name.
+    """
+    if text not in EDGES:
+        raise ValueError(f"invalid edge {text}")
+    return text
+
+
+# Port options and the functions converting their values into
+# port constructor arguments
+PORT_OPTIONS = {
+    "chip": get_chip_path,
+    "debounce": get_duration,
+    "edge": get_edge,
+    "min_pulse": get_duration,
+    "holdoff": get_duration,
+}
+
+# Options that only apply to sensor ports
+SENSOR_OPTIONS = {"debounce", "edge", "min_pulse", "holdoff"}
+
+# Event names specifying a timeout
+TIMER_PATTERN = re.compile(r"([\d.]+)s")
+
+# Entry action shorthands
+CLEAR_COUNTER_PATTERN = re.compile(r"ClearCounter\((\w+)\)")
+CALL_PATTERN = re.compile(r"call\s+(\w+)")
+
+# A lexical token: its kind, line number, and the match of its line
+# or, for Python blocks, their code
+Token = namedtuple("Token", "kind line value")
+
+# AST nodes; each one records the line where it starts
+Configuration = namedtuple("Configuration", "file_name definitions")
+# The options are a dict from the names of the NAME=VALUE port options
+# to their converted values
+PortDefinition = namedtuple(
+    "PortDefinition", "line port_type pcb physical bcm log name options"
+)
+PythonBlock = namedtuple("PythonBlock", "line code")
+InitialState = namedtuple("InitialState", "line name")
+# The body is a list of the state's entry actions and transitions
+StateDefinition = namedtuple("StateDefinition", "line name body")
+EntryAction = namedtuple("EntryAction", "line count command")
+Transition = namedtuple("Transition", "line event target")
+
+
+def tokenize(input_file):
+    """
+    Split the specified configuration into tokens, one per line
+    or Python block.
+    Lines that cannot be classified result in "error" tokens.
+
+    Args:
+        input_file (File): Opened file to tokenize.
+
+    Returns:
+        generator: The tokens of non-blank lines.
+    """
+    # Lines and starting line number of the Python block being read
+    python_lines = None
+    python_line_number = None
+    for line_number, line in enumerate(input_file, 1):
+        line = line.rstrip()
+        if python_lines is not None:
+            if line == "%}":
+                yield Token("python", python_line_number, python_lines)
+                python_lines = None
+            else:
+                python_lines.append(line)
+            continue
+
+        match = LINE_PATTERN.fullmatch(line)
+        if not match:
+            yield Token("error", line_number, line)
+        elif match.lastgroup == "python_begin":
+            python_lines = []
+            python_line_number = line_number + 1
+        elif match.lastgroup != "blank":
+            yield Token(match.lastgroup, line_number, match)
+
+    if python_lines is not None:
+        yield Token("unterminated", python_line_number - 1, python_lines)
+
+
+def parse(input_file):
+    """
+    Parse the specified configuration into an abstract syntax tree.
 
     Args:
         input_file (File): Opened file to parse.
 
     Returns:
-        str: The name of the state from which to start.
+        tuple: The Configuration, and a list of (line number, message)
+            tuples for the errors encountered.
     """
     # pylint: disable=too-many-branches
-    # pylint: disable=too-many-statements
-    # pylint: disable=too-many-locals
     file_name = input_file.name if hasattr(input_file, "name") else "-"
+    definitions = []
+    errors = []
+    # Currently parsed state and line of each state's definition
+    state = None
+    state_lines = {}
+    initial_state = None
 
-    current_line_number = 0
-    number_of_errors = 0
-    initial_state_name = None
+    for kind, line_number, value in tokenize(input_file):
+        if kind == "port":
+            options = parse_port_options(value, line_number, errors)
+            definitions.append(
+                PortDefinition(
+                    line_number,
+                    value["port_type"],
+                    value["pcb"],
+                    value["physical"],
+                    value["bcm"],
+                    value["log"],
+                    value["port_name"],
+                    options,
+                )
+            )
+        elif kind == "python":
+            definitions.append(PythonBlock(line_number, "\n".join(value)))
+        elif kind == "initial":
+            if initial_state:
+                errors.append(
+                    (
+                        line_number,
+                        "initial state already specified in line "
+                        f"{initial_state.line}",
+                    )
+                )
+            initial_state = InitialState(line_number, value["initial_name"])
+            definitions.append(initial_state)
+        elif kind == "state":
+            name = value["state_name"]
+            if name in state_lines and name != "*":
+                errors.append(
+                    (
+                        line_number,
+                        f"state {name} already defined in line "
+                        f"{state_lines[name]}",
+                    )
+                )
+            state_lines.setdefault(name, line_number)
+            state = StateDefinition(line_number, name, [])
+            definitions.append(state)
+        elif kind == "end":
+            state = None
+        elif kind in ("action", "transition") and state is None:
+            errors.append(
+                (line_number, f"{kind} outside a state [{value[0].strip()}]")
+            )
+        elif kind == "action":
+            state.body.append(
+                EntryAction(line_number, value["count"], value["command"])
+            )
+        elif kind == "transition":
+            state.body.append(
+                Transition(line_number, value["event"], value["target"])
+            )
+        elif kind == "bad_port":
+            errors.append(
+                (
+                    line_number,
+                    "expected TYPE PCB PHYSICAL BCM LOG NAME "
+                    "[OPTION=VALUE ...] with numeric PHYSICAL and BCM "
+                    f"[{value[0]}]",
+                )
+            )
+        elif kind == "unterminated":
+            errors.append((line_number, "unterminated Python block"))
+        else:
+            errors.append((line_number, f"syntax error [{value}]"))
 
-    # Currently parsed state
-    state = None
-    in_python_block = False
+    return Configuration(file_name, definitions), errors
 
-    for line in input_file:
-        current_line_number += 1
-        line = line.rstrip()  # Strip trailing newline
 
-        # Remove comments
-        line = re.sub(r"^#.*", "", line).rstrip()
+def parse_port_options(match, line_number, errors):
+    """
+    Return the options of a port definition line.
 
-        # Skip empty lines
-        if not line:
+    Args:
+        match (Match): The match of the port's line.
+        line_number (int): The line's number.
+        errors (list): The (line number, message) list to which to
+            append the errors encountered.
+
+    Returns:
+        dict: Map from the valid options' names to their values.
+    """
+    options = {}
+    for option in match["options"].split():
+        option, text = option.split("=", 1)
+        if option not in PORT_OPTIONS:
+            errors.append((line_number, f"unknown port option {option}"))
+            continue
+        if option in options:
+            errors.append((line_number, f"port option {option} repeated"))
+            continue
+        if option in SENSOR_OPTIONS and match["port_type"] != "SENSOR":
+            errors.append(
+                (line_number, f"port option {option} only applies to sensors")
+            )
             continue
+        try:
+            options[option] = PORT_OPTIONS[option](text)
+        except ValueError as exc:
+            errors.append((line_number, f"port option {option}: {exc}"))
+    if options.get("min_pulse") and options.get("edge") == "both":
+        errors.append((line_number, "min_pulse requires a single edge"))
+        del options["min_pulse"]
+    return options
+
+
+def expand_action(action):
+    """
+    Return the Python expression corresponding to the specified
+    entry action.
 
-        if re.match(r"^SENSOR", line):
-            _io_type, pcb, physical, bcm, log, name = line.split()
-            SensorPort(name, pcb, physical, bcm, log)
+    Args:
+        action (EntryAction): The entry action to expand.
+
+    Returns:
+        str: The expression to evaluate on entry.
+    """
+    command = CLEAR_COUNTER_PATTERN.sub(
+        r'State.get_instance_by_name("\1").clear_counter()', action.command
+    )
+    command = CALL_PATTERN.sub(
+        r'State.get_instance_by_name("\1").enter()', command
+    )
+    if action.count:
+        count = action.count.replace("=", "==")
+        command = f"{command} if self.counter {count} else None"
+    return command
+
+
+def run_python_block(block, file_name):
+    """
+    Execute the specified Python block in the namespace of entry actions.
+
+    Args:
+        block (PythonBlock): The block to execute.
+        file_name (str): The name of the file containing the block.
+
+    Returns:
+        tuple: The (line number, message) of the error encountered,
+            or None if the block executed successfully.
+    """
+    try:
+        # Pad the code, so that reported line numbers match the file's
+        code = compile("\n" * (block.line - 1) + block.code, file_name, "exec")
+        # pylint: disable-next=exec-used
+        exec(code, state_dict)
+    except SyntaxError as exc:
+        return exc.lineno or block.line, exc.msg
+    # pylint: disable-next=broad-except
+    except Exception as exc:
+        line_number = block.line
+        for frame in traceback.extract_tb(exc.__traceback__):
+            if frame.filename == file_name:
+                line_number = frame.lineno
+        return line_number, str(exc)
+    return None
+
+
+def add_entry_actions(actions, file_name):
+    """
+    Compile the specified entry actions and add them to their states.
 
-        elif re.match(r"^ACTUATOR", line):
-            _io_type, pcb, physical, bcm, log, name = line.split()
-            ActuatorPort(name, pcb, physical, bcm, log)
+    Args:
+        actions (list): (state, line number, command) tuples, ordered
+            by line number.
+        file_name (str): The name of the file containing the actions.
 
-        # Python code blocks
-        elif line[:3] == "%{":
-            in_python_block = True
-            python_block_lines = ""
-        elif line[:3] == "%}":
-            in_python_block = False
+    Returns:
+        list: (line number, message) tuples of the errors encountered.
+    """
+    try:
+        functions = State.compile_actions(
+            [(command, line_number) for _, line_number, command in actions],
+            file_name,
+        )
+    except SyntaxError:
+        # Locate all erroneous actions
+        errors = []
+        for _, line_number, command in actions:
             try:
-                # pylint: disable-next=exec-used
-                exec(python_block_lines, state_dict)
-            # pylint: disable-next=broad-except
-            except Exception as exc:
-                sys.stderr.write(
-                    f"{file_name}({current_line_number}): {exc}\n"
-                )
-                number_of_errors += 1
-        elif in_python_block:
-            python_block_lines += line + "\n"
-
-        elif match := re.match(r"^(\w+):$", line):
-            # "name:": Named state begin
-            name = match.group(1)
-            state = State(name)
-
-        elif re.match(r"^\*:$", line):
-            # "*:": Default state transitions, applicable to all
-            state = State.all_states
-
-        elif match := re.match(r"^\%i (\w+)", line):
-            # "%i state": Initial state specification
-            initial_state_name = match.group(1)
-
-        elif match := re.match(r"^\s*\|([=><]\d+)?\s+(.*)", line):
-            # "| command": State entry action
-            count = match.group(1)
-            command = match.group(2)
-            command = re.sub(
-                r"ClearCounter\((\w+)\)",
-                r'State.get_instance_by_name("\1").clear_counter()',
-                command,
+                State.compile_action(command, file_name, line_number)
+            except SyntaxError as exc:
+                errors.append((line_number, f"{exc.msg} [{command}]"))
+        return errors
+
+    for (state, _, command), function in zip(actions, functions):
+        state.add_entry_action(command, function=function)
+    return []
+
+
+def build(configuration, python_blocks=None):
+    """
+    Set up the hardware and the event-processing state transition rules
+    specified in a parsed configuration.
+
+    Args:
+        configuration (Configuration): The parsed configuration.
+        python_blocks (list): If specified, (line number, source code)
+            tuples of the Python blocks executed are appended to it.
+
+    Returns:
+        tuple: The name of the state from which to start, and a list
+            of (line number, message) tuples for the errors encountered.
+    """
+    file_name = configuration.file_name
+    errors = []
+    initial_state_name = None
+    # (state, line number, command) tuples of all entry actions
+    actions = []
+
+    for definition in configuration.definitions:
+        if isinstance(definition, PortDefinition):
+            port_class = (
+                SensorPort
+                if definition.port_type == "SENSOR"
+                else ActuatorPort
             )
-            command = re.sub(
-                r"call\s+(\w+)",
-                r'State.get_instance_by_name("\1").enter()',
-                command,
+            port_class(
+                definition.name,
+                definition.pcb,
+                definition.physical,
+                definition.bcm,
+                definition.log,
+                **definition.options,
             )
-            if count:
-                count = count.replace("=", "==")
-                state.add_entry_action(
-                    f"{command} if self.counter {count} else None"
-                )
-            else:
-                state.add_entry_action(command)
-
-        elif match := re.match(r"^\s*([\w.]+)?\s*>\s*(\w+)", line):
-            # "event > state": State transition
-            event_name = match.group(1)
-            new_state_name = match.group(2)
-            if event_name and re.match(r"^([\d.]+)s$", event_name):
-                # "42s": After N seconds
-                timer_value = re.match(r"^([\d.]+)s$", event_name).group(1)
-                event_name = f"TIMER_{timer_value}"
-                state.add_entry_action(
-                    f"register_timer_event({timer_value}, '{event_name}')"
-                )
-            # Event name may be None, which makes it the non-event
-            # transition.
-            state.add_event_transition(event_name, new_state_name)
+        elif isinstance(definition, PythonBlock):
+            if python_blocks is not None:
+                python_blocks.append((definition.line, definition.code))
+            if error := run_python_block(definition, file_name):
+                errors.append(error)
+        elif isinstance(definition, InitialState):
+            initial_state_name = definition.name
+        elif definition.name == "*":
+            build_state(State.all_states, definition, actions)
+        else:
+            build_state(State(definition.name), definition, actions)
+
+    errors += add_entry_actions(actions, file_name)
+    return initial_state_name, errors
 
-        elif re.search(r"\s*;\s*$", line):
-            # ";": End of state spec
+
+def build_state(state, definition, actions):
+    """
+    Set up the transitions of the specified state, and append its
+    entry actions to the specified list.
+
+    Args:
+        state (State): The state to set up.
+        definition (StateDefinition): The state's parsed definition.
+        actions (list): The (state, line number, command) tuples
+            to append to.
+
+    Returns:
+        None
+    """
+    for item in definition.body:
+        if isinstance(item, EntryAction):
+            actions.append((state, item.line, expand_action(item)))
             continue
 
-        else:
-            sys.stderr.write(
-                f"{file_name}({current_line_number}): syntax error [{line}]\n"
+        event_name = item.event
+        if event_name and (match := TIMER_PATTERN.fullmatch(event_name)):
+            # "42s": After N seconds
+            timer_value = match.group(1)
+            event_name = f"TIMER_{timer_value}"
+            actions.append(
+                (
+                    state,
+                    item.line,
+                    f"register_timer_event({timer_value}, '{event_name}')",
+                )
             )
-            number_of_errors += 1
+        # Event name may be None, which makes it the non-event
+        # transition.
+        state.add_event_transition(event_name, item.target)
 
-    if number_of_errors:
+
+def read_config(input_file, python_blocks=None):
+    """Read the alarm configuration file, setting up the hardware and
+    the event-processing state transition rules.
+
+    Args:
+        input_file (File): Opened file to parse.
+        python_blocks (list): If specified, (line number, source code)
+            tuples of the Python blocks executed are appended to it.
+
+    Returns:
+        str: The name of the state from which to start.
+    """
+    configuration, errors = parse(input_file)
+    initial_state_name, build_errors = build(configuration, python_blocks)
+    errors += build_errors
+    file_name = configuration.file_name
+
+    if errors:
+        for line_number, message in sorted(errors):
+            sys.stderr.write(f"{file_name}({line_number}): {message}\n")
         sys.stderr.write(
-            f"Encountered {number_of_errors} errors during processing.\n"
+            f"Encountered {len(errors)} errors during processing.\n"
         )
         sys.exit(1)
+
+    for state_name, new_state_name in State.finalize():
+        sys.stderr.write(
+            f"{file_name}: warning: transition from {state_name} "
+            f"to undefined state {new_state_name}\n"
+        )
     return initial_state_name
@@ -1,7 +1,218 @@
 """System's event queue"""
 
 import queue
+from time import monotonic
+
+
+class Event(str):
+    """
+    The name of a queued event, annotated with the number of identical
+    events it represents and the (monotonic) time the first one arrived.
+    Events caused by GPIO edges also carry the edge's kernel timestamp
+    and line offset.
+    Being a string, it can be used wherever an event name is expected.
+    """
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def __new__(
+        cls, name, count=1, time=None, timestamp_ns=None, line_offset=None
+    ):
+        event = super().__new__(cls, name)
+        event.count = count
+        event.time = monotonic() if time is None else time
+        # CLOCK_MONOTONIC nanoseconds, as reported by the kernel
+        event.timestamp_ns = timestamp_ns
+        event.line_offset = line_offset
+        return event
+
+
+class EventQueue(queue.Queue):
+    """
+    An unbounded event queue that can optionally coalesce bursts of
+    identical events, such as those of a chattering sensor.
+    """
+
+    def __init__(self):
+        super().__init__()
+        # Period in seconds within which identical events are merged;
+        # zero disables coalescing
+        self.coalescing_window = 0
+        # Map from event name to its coalescible event still in the queue
+        self.pending_events = {}
+        # Map from event name to the number of events merged into others
+        self.coalesced = {}
+        # Function to call when an item is queued
+        self.waker = None
+
+    def set_waker(self, waker):
+        """
+        Set a function to call whenever an item is queued,
+        e.g. to wake up an event loop that doesn't block on the queue.
+        The function is called with the queue's lock held,
+        so it must not block or access the queue.
+
+        Args:
+            waker (callable|None): The function to call; None for none.
+
+        Returns:
+            None
+        """
+        self.waker = waker
+
+    def set_coalescing_window(self, seconds):
+        """
+        Set the period within which identical events are coalesced.
+
+        Args:
+            seconds (float): The coalescing window; zero disables it.
+
+        Returns:
+            None
+        """
+        with self.mutex:
+            self.coalescing_window = seconds
+            self.pending_events.clear()
+
+    def reset(self):
+        """Discard all queued events and coalescing state."""
+        with self.mutex:
+            self.queue.clear()
+            self.unfinished_tasks = 0
+            self.pending_events.clear()
+            self.coalesced.clear()
+
+    def put_coalesced(self, name):
+        """
+        Queue the named event, merging it into an identical event that
+        is still in the queue, if that arrived within the coalescing window.
+        Only use this for events where repetitions carry no additional
+        meaning, such as sensor triggers.
+
+        Args:
+            name (str): The name of the event to queue.
+
+        Returns:
+            Event: The queued event, which may have been queued earlier.
+        """
+        return self.put_batch([Event(name)])[0]
+
+    def put_batch(self, events):
+        """
+        Queue the specified events with a single lock acquisition and
+        wake-up, coalescing each one as put_coalesced() does.
+
+        Args:
+            events (list): The Event objects to queue.
+
+        Returns:
+            list: The queued events, some of which may have been
+                queued earlier.
+        """
+        with self.not_empty:
+            queued = [self._put_coalesced(event) for event in events]
+            self.not_empty.notify()
+            return queued
+
+    def put_all(self, items):
+        """
+        Queue the specified items contiguously, without coalescing,
+        with a single lock acquisition and wake-up, so that no other
+        item can be queued between them.
+
+        Args:
+            items (list): The items to queue in their queueing order.
+
+        Returns:
+            None
+        """
+        if not items:
+            return
+        with self.not_empty:
+            self.queue.extend(items)
+            self.unfinished_tasks += len(items)
+            if self.waker:
+                self.waker()
+            self.not_empty.notify()
+
+    def _put_coalesced(self, event):
+        """Coalesce or queue an event; called with the mutex held."""
+        pending = self.pending_events.get(event)
+        if pending and event.time - pending.time <= self.coalescing_window:
+            pending.count += event.count
+            name = str(event)
+            self.coalesced[name] = self.coalesced.get(name, 0) + event.count
+            return pending
+
+        if self.coalescing_window:
+            self.pending_events[event] = event
+        # Same as put() on an unbounded queue, but atomically
+        # with the lookup above.
+        self._put(event)
+        self.unfinished_tasks += 1
+        return event
+
+    def get_all(self, block=True):
+        """
+        Block until at least one item is available, and then remove
+        and return all queued items with a single lock acquisition.
+
+        Args:
+            block (bool): False to return immediately if no items
+                are available.
+
+        Returns:
+            list: The queued items in their queueing order.
+        """
+        with self.not_empty:
+            while block and not self._qsize():
+                self.not_empty.wait()
+            return [self._get() for _ in range(self._qsize())]
+
+    def unget_all(self, items):
+        """
+        Return the specified items to the front of the queue, so that
+        they will be the next ones to be removed.
+
+        Args:
+            items (list): The items to return in their queueing order.
+
+        Returns:
+            None
+        """
+        if not items:
+            return
+        with self.not_empty:
+            self.queue.extendleft(reversed(items))
+            self.not_empty.notify()
+
+    def _put(self, item):
+        """Add an item to the queue; called with the mutex held."""
+        super()._put(item)
+        if self.waker:
+            self.waker()
+
+    def _get(self):
+        """Remove an item from the queue; called with the mutex held."""
+        item = super()._get()
+        if self.pending_events.get(item) is item:
+            del self.pending_events[item]
+        return item
+
+    def get_counters(self):
+        """
+        Return the queue's coalescing counters.
+
+        Returns:
+            dict: The total number of events merged into others
+                and the corresponding number by event name.
+        """
+        with self.mutex:
+            return {
+                "coalesced": sum(self.coalesced.values()),
+                "coalesced_by_event": dict(self.coalesced),
+            }
+
 
 # Each event is a string denoting a REST command or a sensor activity
 # Use the get(), put(), and empty() methods on it
-event_queue = queue.Queue()
+event_queue = EventQueue()
@@ -0,0 +1,393 @@
+"""
+GPIO backends, through which ports request and access their lines.
+The gpiod backend accesses the hardware; the simulated one provides
+chips whose input lines change according to a script or at random,
+so that the daemon can run end to end, e.g. for load testing.
+"""
+
+import heapq
+import itertools
+import os
+import random
+import threading
+from abc import ABC, abstractmethod
+from time import monotonic_ns
+
+# See https://libgpiod.readthedocs.io/en/latest/python_api.html
+import gpiod
+
+
+def get_chip_path(chip):
+    """
+    Return the device path of the specified GPIO chip.
+
+    Args:
+        chip (str): The chip's number (e.g. 1), name (e.g. gpiochip1),
+            or path (e.g. /dev/gpiochip1).
+
+    Returns:
+        str: The chip's device path.
+    """
+    if chip.isdigit():
+        return f"/dev/gpiochip{chip}"
+    if not chip.startswith("/"):
+        return f"/dev/{chip}"
+    return chip
+
+
+def get_line_settings(config):
+    """
+    Return the settings of each line in a gpiod.request_lines config.
+
+    Args:
+        config (dict): Map from line offsets, or tuples of them,
+            to their LineSettings.
+
+    Returns:
+        dict: Map from each line offset to its LineSettings.
+    """
+    settings = {}
+    for lines, line_settings in config.items():
+        if isinstance(lines, int):
+            lines = (lines,)
+        for line in lines:
+            settings[line] = line_settings or gpiod.LineSettings()
+    return settings
+
+
+class Backend(ABC):
+    """A GPIO backend abstract base class."""
+
+    # pylint: disable=too-few-public-methods
+
+    @abstractmethod
+    def request_lines(self, chip, config, event_buffer_size):
+        """
+        Request the specified lines of a chip.
+
+        Args:
+            chip (str): The path of the chip.
+            config (dict): The lines' configuration, as passed to
+                gpiod.request_lines.
+            event_buffer_size (int): The number of edge events
+                to buffer.
+
+        Returns:
+            LineRequest: An object providing the LineRequest methods
+                used by the ports, which shall be used as a context
+                to release the lines.
+        """
+
+
+class GpiodBackend(Backend):
+    """Access the GPIO hardware through libgpiod."""
+
+    # pylint: disable=too-few-public-methods
+
+    def request_lines(self, chip, config, event_buffer_size):
+        return gpiod.request_lines(
+            chip,
+            consumer="alarm",
+            config=config,
+            event_buffer_size=event_buffer_size,
+        )
+
+
+class SimulatedBackend(Backend):
+    """
+    Provide simulated chips.
+    The value of each input line is raised in pulses occurring at
+    scripted times, and, at random, as a Poisson process of a specified
+    rate.
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, rate=0, script=None, pulse_width=0.05, seed=None):
+        """
+        Initialize the backend.
+
+        Args:
+            rate (float): The average number of pulses per second
+                on each input line.
+            script (list): (seconds, chip, line offset, value) tuples
+                setting the value of the specified line at the specified
+                time after the lines are requested.
+            pulse_width (float): The seconds each random pulse lasts.
+            seed (int): Seed for the random pulses; None for a random one.
+        """
+        self.rate = rate
+        self.script = script or []
+        self.pulse_width = pulse_width
+        self.random = random.Random(seed)
+        self.requests = []
+
+    def request_lines(self, chip, config, event_buffer_size):
+        script = [
+            (seconds, offset, value)
+            for seconds, script_chip, offset, value in self.script
+            if script_chip == chip
+        ]
+        request = SimulatedRequest(
+            get_line_settings(config),
+            event_buffer_size,
+            self.rate,
+            script,
+            self.pulse_width,
+            self.random,
+        )
+        self.requests.append(request)
+        return request
+
+    @staticmethod
+    def read_script(input_file):
+        """
+        Read a simulation script.
+        Each non-blank line specifies the time in seconds after the
+        start, the line's offset, its new value (0 or 1), and,
+        optionally, its chip; comments start with #.
+
+        Args:
+            input_file (File): Opened file to read.
+
+        Returns:
+            list: (seconds, chip path, line offset, value) tuples.
+
+        Raises:
+            ValueError: If a line is malformed.
+        """
+        script = []
+        for line_number, line in enumerate(input_file, 1):
+            fields = line.split("#", 1)[0].split()
+            if not fields:
+                continue
+            if len(fields) not in (3, 4):
+                raise ValueError(
+                    f"line {line_number}: "
+                    "expected SECONDS OFFSET VALUE [CHIP]"
+                )
+            chip = get_chip_path(fields[3] if len(fields) == 4 else "0")
+            script.append(
+                (float(fields[0]), chip, int(fields[1]), int(fields[2]))
+            )
+        return script
+
+
+class SimulatedRequest:
+    """
+    The lines requested from a simulated chip.
+    A thread changes the values of the input lines at the times
+    specified for each pulse, and queues the resulting edge events,
+    timestamped with those times.
+    Its file descriptor becomes readable when events are available.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def __init__(
+        self, settings, event_buffer_size, rate, script, pulse_width, rng
+    ):
+        """
+        Initialize the request, starting to generate edge events.
+
+        Args:
+            settings (dict): Map from line offsets to their LineSettings.
+            event_buffer_size (int): The number of edge events to buffer;
+                events arriving when the buffer is full are lost.
+            rate (float): The average number of pulses per second
+                on each input line.
+            script (list): (seconds, line offset, value) tuples.
+            pulse_width (float): The seconds each random pulse lasts.
+            rng (Random): The source of the random pulses.
+        """
+        self.settings = settings
+        self.values = {
+            offset: (
+                line_settings.output_value
+                if line_settings.direction == gpiod.line.Direction.OUTPUT
+                else gpiod.line.Value.INACTIVE
+            )
+            for offset, line_settings in settings.items()
+        }
+        self.inputs = [
+            offset
+            for offset, line_settings in settings.items()
+            if line_settings.direction == gpiod.line.Direction.INPUT
+        ]
+        # The kernel's default buffer size
+        self.event_buffer_size = event_buffer_size or 16 * len(settings)
+        # Combined rate of all inputs
+        self.rate = rate * len(self.inputs)
+        self.pulse_width_ns = int(pulse_width * 1e9)
+        self.random = rng
+
+        self.condition = threading.Condition()
+        self.events = []
+        self.global_seqno = 0
+        self.line_seqnos = dict.fromkeys(settings, 0)
+        # Number of changes made and of edge events lost
+        self.changes = 0
+        self.overflows = 0
+        self.released = False
+        self.stopped = threading.Event()
+        self.read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self.read_fd, False)
+
+        start = monotonic_ns()
+        # Pending (time, sequence, offset, value) line value changes;
+        # the sequence number keeps equal times in scheduling order
+        self.sequence = itertools.count()
+        self.pending = [
+            (start + int(seconds * 1e9), next(self.sequence), offset, value)
+            for seconds, offset, value in script
+            if offset in self.values
+        ]
+        heapq.heapify(self.pending)
+        # Time of the next random pulse; -1 for none
+        self.next_pulse = start + self.get_interval() if self.rate else -1
+        self.thread = threading.Thread(
+            target=self.run, daemon=True, name="simulated-gpio"
+        )
+        self.thread.start()
+
+    @property
+    def fd(self):
+        """The file descriptor that is readable when events are pending."""
+        return self.read_fd
+
+    def get_interval(self):
+        """Return the nanoseconds to the next random pulse."""
+        return int(self.random.expovariate(self.rate) * 1e9)
+
+    def run(self):
+        """Thread function changing the line values."""
+        while not self.stopped.is_set():
+            now = monotonic_ns()
+            while 0 <= self.next_pulse <= now:
+                offset = self.random.choice(self.inputs)
+                for time, value in [
+                    (self.next_pulse, 1),
+                    (self.next_pulse + self.pulse_width_ns, 0),
+                ]:
+                    heapq.heappush(
+                        self.pending,
+                        (time, next(self.sequence), offset, value),
+                    )
+                self.next_pulse += self.get_interval()
+
+            with self.condition:
+                while self.pending and self.pending[0][0] <= now:
+                    time, _, offset, value = heapq.heappop(self.pending)
+                    self.change(time, offset, value)
+
+            # Sleep until the next change; only this thread adds them
+            deadlines = [self.pending[0][0]] if self.pending else []
+            if self.next_pulse >= 0:
+                deadlines.append(self.next_pulse)
+            if deadlines:
+                self.stopped.wait(max(0, min(deadlines) - now) / 1e9)
+            else:
+                self.stopped.wait()
+
+    def change(self, timestamp_ns, offset, value):
+        """
+        Change the value of the specified line, queueing the edge
+        event, if any, the line is set to detect.
+        Called with the condition's lock held.
+        """
+        self.changes += 1
+        new_value = (
+            gpiod.line.Value.ACTIVE if value else gpiod.line.Value.INACTIVE
+        )
+        if self.values[offset] == new_value:
+            return
+        self.values[offset] = new_value
+
+        edge = self.settings[offset].edge_detection
+        if value and edge in (gpiod.line.Edge.RISING, gpiod.line.Edge.BOTH):
+            event_type = gpiod.EdgeEvent.Type.RISING_EDGE
+        elif not value and edge in (
+            gpiod.line.Edge.FALLING,
+            gpiod.line.Edge.BOTH,
+        ):
+            event_type = gpiod.EdgeEvent.Type.FALLING_EDGE
+        else:
+            return
+
+        if len(self.events) >= self.event_buffer_size:
+            self.overflows += 1
+            return
+        self.global_seqno += 1
+        self.line_seqnos[offset] += 1
+        self.events.append(
+            gpiod.EdgeEvent(
+                event_type.value,
+                timestamp_ns,
+                offset,
+                self.global_seqno,
+                self.line_seqnos[offset],
+            )
+        )
+        if len(self.events) == 1:
+            os.write(self.write_fd, b"x")
+            self.condition.notify_all()
+
+    def read_edge_events(self, max_events=None):
+        """
+        Return the pending edge events, blocking until there are any.
+
+        Args:
+            max_events (int): The maximum number of events to return.
+
+        Returns:
+            list: The EdgeEvent objects; empty if the lines are released.
+        """
+        with self.condition:
+            while not self.events and not self.released:
+                self.condition.wait()
+            count = max_events or len(self.events)
+            events = self.events[:count]
+            del self.events[:count]
+            if not self.events and not self.released:
+                try:
+                    os.read(self.read_fd, 1)
+                except BlockingIOError:
+                    pass
+            return events
+
+    def get_value(self, offset):
+        """Return the value of the specified line."""
+        return self.values[offset]
+
+    def get_values(self, offsets=None):
+        """Return the values of the specified lines; all by default."""
+        if offsets is None:
+            offsets = list(self.values)
+        return [self.values[offset] for offset in offsets]
+
+    def set_value(self, offset, value):
+        """Set the value of the specified output line."""
+        self.values[offset] = value
+
+    def set_values(self, values):
+        """Set the output lines to the values of the specified dict."""
+        self.values.update(values)
+
+    def release(self):
+        """Stop generating events and release the lines."""
+        if self.released:
+            return
+        self.stopped.set()
+        self.thread.join()
+        with self.condition:
+            self.released = True
+            self.condition.notify_all()
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
@@ -1,21 +1,39 @@
 """Abstract GPIO sensor and actuator ports."""
 
+# pylint: disable=too-many-lines
+
 from abc import ABC, abstractmethod
+from array import array
 from datetime import timedelta
 
 # See https://libgpiod.readthedocs.io/en/latest/python_api.html
 import os
+import select
 import sys
 import syslog
 import threading
+import time
+from contextlib import ExitStack
 
 import gpiod
 
 from alarmd.debug import Debug
-from .event_queue import event_queue
-
+from .broadcast import broadcaster
+from .disabled import disabled_sensors
+from .event_queue import Event, event_queue
+from .gpio import GpiodBackend
+from .status import write_document
+from .syslogger import syslog_worker
+
+# The chip of ports that don't specify one
 CHIP_PATH = "/dev/gpiochip0"
-DISABLEPATH = "/var/spool/alarm/disable/"
+
+# Sensor edge detection settings
+EDGES = {
+    "rising": gpiod.line.Edge.RISING,
+    "falling": gpiod.line.Edge.FALLING,
+    "both": gpiod.line.Edge.BOTH,
+}
 
 if "pytest" in sys.modules:
     SENSORPATH = "."
@@ -30,30 +48,107 @@ class Port(ABC):
 
     # pylint: disable=too-many-public-methods
 
+    __slots__ = ("name", "pcb", "physical", "bcm", "chip", "emulated_value")
+
     # All ports
     ports_by_name = {}
-    ports_by_bcm = {}
+    # Map from chip paths to lists of the chip's ports indexed by
+    # BCM line offset; None for offsets without a port
+    ports_by_chip = {}
     ports = []
 
+    # Sensor ports, in the order of their index, which is also that of
+    # their bits in value snapshots
+    sensors = []
+    # Map from chip paths to the indices and BCM line offsets of the
+    # chip's sensors, so that they can be read with a single request
+    sensor_lines = {}
+    actuators = []
+
+    # Mutable sensor state, kept in arrays parallel to sensors,
+    # so that it can be processed in bulk
+    # The name of the events to generate, or None
+    sensor_event_names = []
+    # Number of times each sensor has raised an alarm
+    sensor_counts = array("l")
+    # Time each sensor last raised an alarm, or zero
+    sensor_fired = array("d")
+    # True to log triggers when disabled
+    # Was log_when_disabled in the C version
+    sensor_always_logging = bytearray()
+
+    # Filtering of edge events in the watcher, for sensors whose
+    # sensor_filtering element is true
+    sensor_filtering = bytearray()
+    # Nanoseconds a pulse must last to be accepted, or zero
+    sensor_min_pulse_ns = array("q")
+    # Nanoseconds after an accepted edge during which edges are dropped
+    sensor_holdoff_ns = array("q")
+    # Start of the current pulse, or -1, and time of the last accepted edge
+    sensor_pulse_start_ns = array("q")
+    sensor_accepted_ns = array("q")
+    # Number of edges dropped by the filter
+    sensor_filtered = array("q")
+
     # True when GPIO is emulated
     is_emulated = False
 
-    # LineRequest
+    # The backend through which lines are requested
+    backend = GpiodBackend()
+    # Map from chip paths to their LineRequest
     # See https://libgpiod.readthedocs.io/en/latest/python_line_request.html
-    request = None
+    requests = {}
+
+    # Maximum number of GPIO edge events read and queued together
+    edge_buffer_size = 64
+
+    # File to which the sensors' status is written as a single document,
+    # or None to mark each firing sensor with a file in SENSORPATH
+    status_path = None
 
     @classmethod
     def set_emulated(cls, value):
         """Set whether GPIO is emulated or not."""
         cls.is_emulated = value
 
+    @classmethod
+    def set_backend(cls, backend):
+        """Set the GPIO backend through which lines are requested."""
+        cls.backend = backend
+
+    @classmethod
+    def set_status_path(cls, path):
+        """Set the file to which the sensors' status is written."""
+        cls.status_path = path
+
+    @classmethod
+    def set_edge_buffer_size(cls, size):
+        """Set the maximum number of edge events read at once."""
+        cls.edge_buffer_size = size
+
     @classmethod
     def reset(cls):
         """Reset global variables to their default values."""
         cls.set_emulated(False)
+        cls.set_backend(GpiodBackend())
+        cls.set_status_path(None)
         cls.ports_by_name.clear()
-        cls.ports_by_bcm.clear()
+        cls.ports_by_chip.clear()
         cls.ports.clear()
+        cls.sensors.clear()
+        cls.sensor_lines.clear()
+        cls.requests.clear()
+        cls.actuators.clear()
+        cls.sensor_event_names.clear()
+        del cls.sensor_counts[:]
+        del cls.sensor_fired[:]
+        cls.sensor_always_logging.clear()
+        cls.sensor_filtering.clear()
+        del cls.sensor_min_pulse_ns[:]
+        del cls.sensor_holdoff_ns[:]
+        del cls.sensor_pulse_start_ns[:]
+        del cls.sensor_accepted_ns[:]
+        del cls.sensor_filtered[:]
 
     @classmethod
     def get_instance_by_name(cls, name):
@@ -70,45 +165,66 @@ class Port(ABC):
         return cls.ports_by_name.get(name)
 
     @classmethod
-    def get_instance_by_bcm(cls, bcm):
+    def get_instance_by_bcm(cls, bcm, chip=CHIP_PATH):
         """
         Return the port with the specified bcm line offset.
 
         Args:
             bcm (int): The port's BCM line offset
+            chip (str): The path of the port's chip
 
         Returns:
-            Port: The object associated with the named port.
-            None: If the name does not specify a known port.
+            Port: The object associated with the specified line offset.
+            None: If the line offset does not specify a known port.
         """
-        return cls.ports_by_bcm[bcm]
+        ports_by_bcm = cls.ports_by_chip.get(chip, [])
+        if 0 <= bcm < len(ports_by_bcm):
+            return ports_by_bcm[bcm]
+        return None
 
     @classmethod
-    def request_lines(cls):
-        """Setup and return all the port monitoring object.
-        The object is set in this module to be used for port I/O.
-        A thread is setup for monitoring and queuing port events.
+    def request_lines(cls, watch=True):
+        """Setup the port monitoring objects, one for each chip.
+        The objects are set in this module to be used for port I/O.
+        A single thread is setup for monitoring and queuing the
+        events of all chips.
         The returned object shall be used as a context to free to
         acquired resources.
 
         Args:
-            None
+            watch (bool): False to monitor the port events through other
+                means, e.g. an event loop waiting on the objects' fds.
 
         Returns:
-            LineRequest : The LineRequest object for the configured ports.
+            ExitStack: A context releasing the LineRequest objects,
+                which are available in Port.requests.
         """
-        # Obtain list of port configurations dicts
-        port_configs = [port.gpiod_line_config() for port in cls.ports]
-        # Convert it into a single dict
-        config = {k: v for d in port_configs for k, v in d.items()}
-        cls.request = gpiod.request_lines(
-            CHIP_PATH, consumer="alarm", config=config
-        )
-        event_thread = threading.Thread(
-            target=SensorPort.watch_line_value, args=[cls.request], daemon=True
-        )
-        event_thread.start()
-        return cls.request
+        # Group the port configurations by chip
+        configs = {}
+        for port in cls.ports:
+            configs.setdefault(port.chip, {}).update(port.gpiod_line_config())
+        requests = {}
+        # Release the lines already requested if a request fails
+        with ExitStack() as stack:
+            for chip, config in configs.items():
+                requests[chip] = stack.enter_context(
+                    cls.backend.request_lines(
+                        chip, config, cls.edge_buffer_size
+                    )
+                )
+            resources = stack.pop_all()
+        cls.requests.clear()
+        cls.requests.update(requests)
+        # Avoid filesystem access when handling edge events
+        disabled_sensors.start()
+        if watch:
+            event_thread = threading.Thread(
+                target=SensorPort.watch_line_values,
+                args=[requests],
+                daemon=True,
+            )
+            event_thread.start()
+        return resources
 
     @classmethod
     def list_ports(cls):
@@ -120,8 +236,8 @@ class Port(ABC):
                 + ("sensor)" if port.is_sensor() else "actuator)")
             )
 
-    # pylint: disable-next=too-many-arguments
-    def __init__(self, name, pcb, physical, bcm, _log):
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def __init__(self, name, pcb, physical, bcm, _log, chip=CHIP_PATH):
         """
         Initialize a new I/O port instance.
 
@@ -131,6 +247,7 @@ class Port(ABC):
             physical (int): The physical pin number associated with the port.
             bcm (int): The BCM (Broadcom) GPIO pin number.
             log (bool): Indicates whether logging is enabled for this port.
+            chip (str): The path of the port's GPIO chip.
 
         Returns:
             None
@@ -141,11 +258,15 @@ class Port(ABC):
         self.pcb = pcb
         self.physical = int(physical)
         self.bcm = int(bcm)
+        self.chip = chip
         self.emulated_value = None
 
         Port.ports.append(self)
         Port.ports_by_name[name] = self
-        Port.ports_by_bcm[self.bcm] = self
+        ports_by_bcm = Port.ports_by_chip.setdefault(chip, [])
+        if self.bcm >= len(ports_by_bcm):
+            ports_by_bcm.extend([None] * (self.bcm + 1 - len(ports_by_bcm)))
+        ports_by_bcm[self.bcm] = self
         Debug.log(self)
 
     @abstractmethod
@@ -241,10 +362,11 @@ class Port(ABC):
         """
         raise TypeError(f"Method not supported by {self.__class__.__name__}")
 
-    def get_value(self):
+    def get_value(self, snapshot=None):
         """Return the port's value.
         Args:
-            None
+            snapshot (SensorSnapshot): The snapshot from which to obtain
+                the value; None to read it directly.
 
         Returns:
             int: The value to set the port to (0 or 1).
@@ -304,6 +426,11 @@ class Port(ABC):
 class SensorPort(Port):
     """An alarm system input port"""
 
+    # pylint: disable=too-many-public-methods
+
+    # The port's mutable state is in Port's sensor_* arrays
+    __slots__ = ("index", "debounce", "edge")
+
     @classmethod
     def set_sensor_event(cls, name, value):
         """
@@ -317,138 +444,347 @@ class SensorPort(Port):
             None
         """
         if name == "*":
-            for port in cls.ports:
-                if port.is_sensor():
-                    port.set_event_name(value)
+            cls.sensor_event_names[:] = [value] * len(cls.sensors)
         else:
             cls.get_instance_by_name(name).set_event_name(value)
 
+    @classmethod
+    def read_values(cls):
+        """
+        Read the values of all sensors with a single request per chip.
+
+        Returns:
+            int: A bitmask whose bit i is set if the sensor at index i
+                of Port.sensors is active.
+        """
+        snapshot = 0
+        if Port.is_emulated:
+            for index, port in enumerate(Port.sensors):
+                if port.emulated_value:
+                    snapshot |= 1 << index
+            return snapshot
+
+        active = gpiod.line.Value.ACTIVE
+        for chip, (indices, bcms) in Port.sensor_lines.items():
+            values = Port.requests[chip].get_values(bcms)
+            for index, value in zip(indices, values):
+                if value == active:
+                    snapshot |= 1 << index
+        return snapshot
+
     @classmethod
     def zero_sensors(cls):
         """Clear the count and file of all sensors."""
-        for port in cls.ports:
-            if not port.is_sensor():
-                continue
+        cls.sensor_counts[:] = array("l", [0]) * len(cls.sensor_counts)
+        cls.sensor_fired[:] = array("d", [0]) * len(cls.sensor_fired)
+        if cls.status_path:
+            write_document(cls.status_path, cls.get_status())
+            return
+        for port in cls.sensors:
             try:
-                os.remove(f"{SENSORPATH}/{port.get_name()}")
+                os.remove(f"{SENSORPATH}/{port.name}")
             except FileNotFoundError:
                 pass
-            port.clear_count()
 
     @classmethod
     def increment_sensors(cls):
         """Increment the count and mark files for all event-generating
         and activity sensing sensors."""
         Debug.log("Incrementing sensors")
-        for port in cls.ports:
-            if not port.is_sensor():
-                Debug.log(f"{port} is not sensor")
+        snapshot = SensorSnapshot()
+        now = time.time()
+        for port, event_name in zip(cls.sensors, cls.sensor_event_names):
+            if not event_name:
+                Debug.log(port, "is not generating events")
                 continue
-            if not port.is_event_generating():
-                Debug.log(f"{port} is not generating events")
+            if not port.get_value(snapshot):
+                Debug.log(port, "is not firing")
                 continue
-            if not port.get_value():
-                Debug.log(f"{port} is not firing")
+            cls.sensor_counts[port.index] += 1
+            cls.sensor_fired[port.index] = now
+            if cls.status_path:
                 continue
             file_path = f"{SENSORPATH}/{port.get_name()}"
             try:
                 with open(file_path, "wb"):
                     pass
             except OSError as exc:
-                syslog.syslog(
+                syslog_worker.log(
                     syslog.LOG_ERR, f"Failed to create {file_path}: {exc}"
                 )
-            port.increment_count()
+        if cls.status_path:
+            write_document(cls.status_path, cls.get_status())
 
     @classmethod
-    def watch_line_value(cls, request):
+    def get_status(cls):
         """
-        Thread function to monitor GPIO input rises.
+        Return the status of all sensors.
+
+        Returns:
+            dict: The time of the status and, under "sensors", a map
+                from each sensor's name to a list of its alarm count
+                and the time of its last alarm, or None.
+        """
+        return {
+            "time": time.time(),
+            "sensors": {
+                port.name: [count, fired or None]
+                for port, count, fired in zip(
+                    cls.sensors, cls.sensor_counts, cls.sensor_fired
+                )
+            },
+        }
+
+    @classmethod
+    def watch_line_values(cls, requests):
+        """
+        Thread function to monitor GPIO input rises on all chips.
+        A single thread waits on the file descriptors of all requests.
 
         Args:
-            request (LineRequest ): The LineRequest object to monitor
+            requests (dict): Map from chip paths to the LineRequest
+                objects to monitor.
 
         Returns:
             None
         """
+        poller = select.epoll()
+        chips_by_fd = {}
+        for chip, request in requests.items():
+            poller.register(request.fd, select.EPOLLIN)
+            chips_by_fd[request.fd] = chip
         while True:
             # Blocks until at least one event is available
-            for event in request.read_edge_events():
-                port = Port.get_instance_by_bcm(event.line_offset)
-                port_name = port.get_name()
-
-                # Auto-disabled?
-                if port.get_count() > 3:
-                    syslog.syslog(
-                        syslog.LOG_INFO,
-                        f"trigger: {port_name} (auto-disabled)",
-                    )
-                    continue
+            for fd, _ in poller.poll():
+                chip = chips_by_fd[fd]
+                cls.handle_edge_events(
+                    requests[chip].read_edge_events(cls.edge_buffer_size),
+                    chip,
+                )
+
+    @classmethod
+    def filter_edge(cls, index, edge_event):
+        """
+        Apply the minimum pulse and holdoff filters of the sensor with
+        the specified index to an edge event.
+        With a minimum pulse, the sensor's lines report both edges:
+        its configured edge starts a pulse, and the opposite one ends
+        it, and is accepted if the pulse lasted long enough.
 
-                # Not enabled?
-                event_name = port.get_event_name()
-                if not event_name:
-                    if port.is_always_logging():
-                        syslog.syslog(
-                            syslog.LOG_INFO, f"trigger: {port_name} (disabled)"
-                        )
+        Args:
+            index (int): The sensor's index.
+            edge_event (EdgeEvent): The edge event to filter.
+
+        Returns:
+            int: The timestamp of the accepted edge or pulse, or None
+                if the event shall be dropped.
+        """
+        timestamp_ns = edge_event.timestamp_ns
+        if Port.sensor_min_pulse_ns[index]:
+            if edge_event.event_type == Port.sensors[index].get_pulse_edge():
+                Port.sensor_pulse_start_ns[index] = timestamp_ns
+                return None
+            start_ns = Port.sensor_pulse_start_ns[index]
+            Port.sensor_pulse_start_ns[index] = -1
+            if start_ns < 0:
+                return None
+            if timestamp_ns - start_ns < Port.sensor_min_pulse_ns[index]:
+                Port.sensor_filtered[index] += 1
+                return None
+            timestamp_ns = start_ns
+
+        holdoff_ns = Port.sensor_holdoff_ns[index]
+        if holdoff_ns:
+            accepted_ns = Port.sensor_accepted_ns[index]
+            if accepted_ns >= 0 and timestamp_ns - accepted_ns < holdoff_ns:
+                Port.sensor_filtered[index] += 1
+                return None
+            Port.sensor_accepted_ns[index] = timestamp_ns
+        return timestamp_ns
+
+    @classmethod
+    def handle_edge_events(cls, edge_events, chip=CHIP_PATH):
+        """
+        Queue the events associated with the specified GPIO edge events,
+        skipping those of disabled sensors and those dropped by the
+        sensors' filters.
+        The events are queued together, each one carrying its edge's
+        kernel timestamp, or that of its pulse's start, and line offset,
+        and are published to the streaming clients.
+
+        Args:
+            edge_events (list): The EdgeEvent objects to handle.
+            chip (str): The path of the chip the events occurred on.
+
+        Returns:
+            None
+        """
+        ports_by_bcm = Port.ports_by_chip[chip]
+        counts = Port.sensor_counts
+        event_names = Port.sensor_event_names
+        filtering = Port.sensor_filtering
+        events = []
+        for edge_event in edge_events:
+            line_offset = edge_event.line_offset
+            port = ports_by_bcm[line_offset]
+            port_name = port.name
+            index = port.index
+
+            # Glitch or too frequent?
+            if filtering[index]:
+                timestamp_ns = cls.filter_edge(index, edge_event)
+                if timestamp_ns is None:
                     continue
+            else:
+                timestamp_ns = edge_event.timestamp_ns
+
+            # Auto-disabled?
+            if counts[index] > 3:
+                syslog_worker.log(
+                    syslog.LOG_INFO,
+                    f"trigger: {port_name} (auto-disabled)",
+                )
+                continue
 
-                # Disabled by user file?
-                if port.user_disabled():
-                    syslog.syslog(
-                        syslog.LOG_INFO,
-                        f"trigger: {port_name} (user-disabled)",
+            # Not enabled?
+            event_name = event_names[index]
+            if not event_name:
+                if Port.sensor_always_logging[index]:
+                    syslog_worker.log(
+                        syslog.LOG_INFO, f"trigger: {port_name} (disabled)"
                     )
-                    continue
+                continue
 
-                Debug.log(f"Queueing {event_name=} for {port_name=}")
-                event_queue.put(event_name)
+            # Disabled by user file?
+            if port.user_disabled():
+                syslog_worker.log(
+                    syslog.LOG_INFO,
+                    f"trigger: {port_name} (user-disabled)",
+                )
+                continue
+
+            Debug.log("Queueing event", event_name, "for port", port_name)
+            broadcaster.publish(
+                "sensor", {"sensor": port_name, "event": event_name}
+            )
+            events.append(
+                Event(
+                    event_name,
+                    timestamp_ns=timestamp_ns,
+                    line_offset=line_offset,
+                )
+            )
+        if events:
+            event_queue.put_batch(events)
 
     @classmethod
     def sensor_display(cls):
         """List available ports"""
-        for port in cls.ports:
-            if not port.is_sensor():
-                continue
-            print(f"{port.get_name()}: {port.get_value()}")
+        snapshot = SensorSnapshot()
+        for port in cls.sensors:
+            print(f"{port.get_name()}: {port.get_value(snapshot)}")
 
     # This is called by parsing a nicely formatted DSL table,
     # so number of arguments isn't a big concern.
     # pylint: disable-next=too-many-positional-arguments,too-many-arguments
-    def __init__(self, name, pcb, physical, bcm, log):
-        # pylint: disable-next=too-many-arguments,too-many-positional-arguments
-        super().__init__(name, pcb, physical, bcm, log)
-
-        # The name of the events to generate, or None
-        self.event_name = None
+    def __init__(
+        self,
+        name,
+        pcb,
+        physical,
+        bcm,
+        log,
+        chip=CHIP_PATH,
+        debounce=0.2,
+        edge="rising",
+        min_pulse=0,
+        holdoff=0,
+    ):
+        """
+        Initialize a new sensor port instance.
 
-        # Number of times the sensor has raised an alarm
-        # Incremented on alarms and auto-disabled when it reaches
-        # AUTO_DISABLE_COUNT
-        self.count = 0
+        Args:
+            name, pcb, physical, bcm, log, chip: As for Port.
+            debounce (float): The seconds for which the line must be
+                stable for an edge to be reported by the kernel.
+            edge (str): The edge that triggers the sensor: rising,
+                falling, or both.
+            min_pulse (float): The seconds the line must stay active
+                after the triggering edge for the sensor to trigger;
+                zero for no minimum.
+            holdoff (float): The seconds after the sensor triggers
+                during which further edges are ignored; zero for none.
 
-        # True to log triggers when disabled
-        # Was log_when_disabled in the C version
-        self.always_logging = bool(log)
+        Returns:
+            None
+        """
+        # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+        super().__init__(name, pcb, physical, bcm, log, chip)
+        if min_pulse and edge == "both":
+            raise ValueError("A minimum pulse requires a single edge")
+        self.debounce = debounce
+        self.edge = edge
+
+        # The sensor's index in the sensor arrays and its bit
+        # in value snapshots
+        self.index = len(Port.sensors)
+        Port.sensors.append(self)
+        indices, bcms = Port.sensor_lines.setdefault(chip, ([], []))
+        indices.append(self.index)
+        bcms.append(self.bcm)
+        Port.sensor_event_names.append(None)
+        # Incremented on alarms and auto-disabled when it exceeds 3
+        Port.sensor_counts.append(0)
+        Port.sensor_fired.append(0)
+        Port.sensor_always_logging.append(bool(log))
+        Port.sensor_filtering.append(bool(min_pulse or holdoff))
+        Port.sensor_min_pulse_ns.append(round(min_pulse * 1e9))
+        Port.sensor_holdoff_ns.append(round(holdoff * 1e9))
+        Port.sensor_pulse_start_ns.append(-1)
+        Port.sensor_accepted_ns.append(-1)
+        Port.sensor_filtered.append(0)
 
     def gpiod_line_config(self):
         return {
             self.bcm: gpiod.LineSettings(
                 direction=gpiod.line.Direction.INPUT,
                 bias=gpiod.line.Bias.PULL_UP,
-                edge_detection=gpiod.line.Edge.RISING,
-                debounce_period=timedelta(milliseconds=200),
+                # The minimum pulse filter needs to see pulses end
+                edge_detection=(
+                    gpiod.line.Edge.BOTH
+                    if self.get_min_pulse()
+                    else EDGES[self.edge]
+                ),
+                debounce_period=timedelta(seconds=self.debounce),
             )
         }
 
+    def get_pulse_edge(self):
+        """Return the EdgeEvent type that starts the sensor's pulses."""
+        if self.edge == "falling":
+            return gpiod.EdgeEvent.Type.FALLING_EDGE
+        return gpiod.EdgeEvent.Type.RISING_EDGE
+
+    def get_min_pulse(self):
+        """Return the seconds a pulse must last to trigger the sensor."""
+        return Port.sensor_min_pulse_ns[self.index] / 1e9
+
+    def get_holdoff(self):
+        """Return the seconds after a trigger during which edges are
+        ignored."""
+        return Port.sensor_holdoff_ns[self.index] / 1e9
+
+    def get_filtered_count(self):
+        """Return the number of edges dropped by the sensor's filters."""
+        return Port.sensor_filtered[self.index]
+
     def is_always_logging(self):
         """Return true if the sensor is logging even when disabled."""
-        return self.always_logging
+        return bool(Port.sensor_always_logging[self.index])
 
     def is_event_generating(self):
         """Return true if the sensor has an event associated with it."""
-        return bool(self.event_name)
+        return bool(Port.sensor_event_names[self.index])
 
     def is_sensor(self):
         """Return true if the port is associated with a sensor."""
@@ -460,31 +796,43 @@ class SensorPort(Port):
 
     def set_event_name(self, value):
         """Set the sensor to trigger the specified event."""
-        self.event_name = value
+        Port.sensor_event_names[self.index] = value
 
     def get_event_name(self):
         """Return the event associated with the sensor, if any."""
-        return self.event_name
+        return Port.sensor_event_names[self.index]
 
     def clear_count(self):
         """Clear the number of times the sensor has been triggered."""
-        self.count = 0
+        Port.sensor_counts[self.index] = 0
 
     def increment_count(self):
         """Increment the number of times the sensor has been triggered."""
-        self.count += 1
+        Port.sensor_counts[self.index] += 1
 
     def get_count(self):
         """Return the number of times the sensor has been triggered."""
-        return self.count
+        return Port.sensor_counts[self.index]
+
+    def get_value(self, snapshot=None):
+        """
+        Return the sensor's input value.
+
+        Args:
+            snapshot (SensorSnapshot): The snapshot from which to obtain
+                the value; None to read it directly.
 
-    def get_value(self):
-        """Return the sensor's input value."""
+        Returns:
+            int: 1 if the sensor is active, 0 otherwise.
+        """
+        if snapshot is not None:
+            return snapshot.get_value(self.index)
         if Port.is_emulated:
             return self.emulated_value
         return (
             1
-            if Port.request.get_value(self.bcm) == gpiod.line.Value.ACTIVE
+            if Port.requests[self.chip].get_value(self.bcm)
+            == gpiod.line.Value.ACTIVE
             else 0
         )
 
@@ -500,15 +848,47 @@ class SensorPort(Port):
         Return True if the port has been externally disabled by the user.
 
         Returns:
-            bool: True if the file exists, indicating the port is disabled.
+            bool: True if the sensor's file exists in the disable
+                directory, indicating the port is disabled.
+        """
+        return disabled_sensors.is_disabled(self.name)
+
+
+class SensorSnapshot:
+    """
+    The values of all sensors at one point in time.
+    They are read together with a single request, when first needed,
+    so that iterating over many sensors costs a single system call.
+    """
+
+    # pylint: disable=too-few-public-methods
+
+    __slots__ = ("values",)
+
+    def __init__(self):
+        # Bitmask returned by SensorPort.read_values(), once read
+        self.values = None
+
+    def get_value(self, index):
+        """
+        Return the value of the sensor with the specified index.
+
+        Args:
+            index (int): The sensor's index in Port.sensors.
+
+        Returns:
+            int: 1 if the sensor is active, 0 otherwise.
         """
-        file_path = os.path.join(DISABLEPATH, self.get_name())
-        return os.path.exists(file_path)
+        if self.values is None:
+            self.values = SensorPort.read_values()
+        return (self.values >> index) & 1
 
 
 class ActuatorPort(Port):
     """An alarm system output port"""
 
+    __slots__ = ()
+
     @classmethod
     def set_bit(cls, name, value):
         """
@@ -523,6 +903,82 @@ class ActuatorPort(Port):
         """
         cls.get_instance_by_name(name).set_value(value)
 
+    @classmethod
+    def read_values(cls):
+        """
+        Read the values of all actuators with a single request per chip.
+
+        Returns:
+            list: The values (0 or 1) of the ports in Port.actuators.
+        """
+        if Port.is_emulated:
+            return [port.emulated_value or 0 for port in Port.actuators]
+
+        lines_by_chip = {}
+        for index, port in enumerate(Port.actuators):
+            lines_by_chip.setdefault(port.chip, []).append((index, port.bcm))
+        values = [0] * len(Port.actuators)
+        active = gpiod.line.Value.ACTIVE
+        for chip, lines in lines_by_chip.items():
+            indices, bcms = zip(*lines)
+            chip_values = Port.requests[chip].get_values(list(bcms))
+            for index, value in zip(indices, chip_values):
+                values[index] = 1 if value == active else 0
+        return values
+
+    @classmethod
+    def set_bits(cls, values):
+        """
+        Set the ports with the specified names to the specified values
+        at the same time, with a single request per chip.
+
+        Args:
+            values (dict): Map from port names to the values to set
+                them to (0 or 1).
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If a name does not specify a known port.
+            TypeError: If a name specifies a port that isn't an actuator.
+        """
+        ports = []
+        # Validate all names before setting any port
+        for name, value in values.items():
+            port = cls.get_instance_by_name(name)
+            if port is None:
+                raise ValueError(f"Unknown port {name}")
+            if not port.is_actuator():
+                raise TypeError(
+                    f"Method not supported by {port.__class__.__name__}"
+                )
+            ports.append((port, value))
+        if Port.is_emulated:
+            for port, value in ports:
+                port.emulated_value = value
+            return
+        settings = ", ".join(
+            f"{port.name} {'on' if value else 'off'}" for port, value in ports
+        )
+        # Every write is logged, so that the log records the ports' history
+        syslog_worker.log(
+            syslog.LOG_INFO, f"set {settings}", deduplicate=False
+        )
+        values_by_chip = {}
+        for port, value in ports:
+            values_by_chip.setdefault(port.chip, {})[port.bcm] = (
+                gpiod.line.Value.ACTIVE if value else gpiod.line.Value.INACTIVE
+            )
+        for chip, chip_values in values_by_chip.items():
+            Port.requests[chip].set_values(chip_values)
+
+    # pylint: disable-next=too-many-positional-arguments,too-many-arguments
+    def __init__(self, name, pcb, physical, bcm, log, chip=CHIP_PATH):
+        # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+        super().__init__(name, pcb, physical, bcm, log, chip)
+        Port.actuators.append(self)
+
     def gpiod_line_config(self):
         return {
             self.bcm: gpiod.LineSettings(
@@ -541,10 +997,12 @@ class ActuatorPort(Port):
         if Port.is_emulated:
             self.emulated_value = value
         else:
-            syslog.syslog(
-                syslog.LOG_INFO, f"set {self.name} {'on' if value else 'off'}"
+            syslog_worker.log(
+                syslog.LOG_INFO,
+                f"set {self.name} {'on' if value else 'off'}",
+                deduplicate=False,
             )
-            Port.request.set_value(
+            Port.requests[self.chip].set_value(
                 self.bcm,
                 (
                     gpiod.line.Value.ACTIVE
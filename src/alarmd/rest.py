@@ -1,21 +1,35 @@
 """Implement alarm's REST interface."""
 
+import json
 import syslog
 
-from flask import Flask, abort, jsonify, request
+from flask import Flask, Response, abort, jsonify, request
 
+from alarmd.broadcast import broadcaster
 from alarmd.debug import Debug
-from alarmd.port import Port
+from alarmd.disabled import disabled_sensors
+from alarmd.port import ActuatorPort, Port, SensorSnapshot
 from alarmd.event_queue import event_queue
 from alarmd.state import State
+from alarmd.syslogger import syslog_worker
 
 # Flask setup
 app = Flask(__name__)
 
 
+# Client addresses allowed access: the loopback one, and the one
+# reported for clients of a Unix domain socket, whose access is
+# controlled through the socket's permissions
+ALLOWED_ADDRESSES = {"127.0.0.1", "<local>"}
+
+# Seconds after which an idle stream is sent a comment, so that
+# the connections of departed clients are detected and closed
+KEEPALIVE_INTERVAL = 15
+
+
 def access_check():
-    """Only allow localhost requests."""
-    if request.remote_addr != "127.0.0.1":
+    """Only allow localhost and Unix domain socket requests."""
+    if request.remote_addr not in ALLOWED_ADDRESSES:
         abort(403)  # Forbidden
 
 
@@ -35,7 +49,7 @@ def rest_cmd(name):
     """
     access_check()
     event = f"Cmd{name}"
-    Debug.log(f"Queuing REST command event {event}")
+    Debug.log("Queuing REST command event", event)
     if not State.all_states.has_event_transition(event):
         abort(404)  # Not found
     syslog.syslog(syslog.LOG_INFO, f"command: {event}")
@@ -43,6 +57,38 @@ def rest_cmd(name):
     return jsonify({event: "OK"})
 
 
+@app.route("/cmd", methods=["POST"])
+def rest_cmd_batch():
+    """
+    Function registered to be called when a REST request
+    POST /cmd is issued, with a JSON body of the form
+    {"commands": [<command>, ...]}.
+    All commands are validated, as for /cmd/<command>, before any is
+    queued; they are then queued together, in order, so that no other
+    event can be processed between them.
+
+    Returns:
+        str: JSON with the following structure
+            "queued": [<event name>, ...]
+    """
+    access_check()
+    body = request.get_json(silent=True)
+    commands = body.get("commands") if isinstance(body, dict) else None
+    if (
+        not isinstance(commands, list)
+        or not commands
+        or not all(isinstance(name, str) for name in commands)
+    ):
+        abort(400)  # Bad request
+    events = [f"Cmd{name}" for name in commands]
+    Debug.log("Queuing REST command events", events)
+    if not all(map(State.all_states.has_event_transition, events)):
+        abort(404)  # Not found
+    syslog.syslog(syslog.LOG_INFO, f"commands: {' '.join(events)}")
+    event_queue.put_all(events)
+    return jsonify({"queued": events})
+
+
 @app.route("/state", methods=["GET"])
 def rest_status():
     """Return the alarm's state."""
@@ -54,6 +100,143 @@ def rest_status():
     )
 
 
+@app.route("/trace", methods=["GET"])
+def rest_trace():
+    """
+    Return the recently processed events.
+
+    Returns:
+        str: JSON with the following structure
+            "trace": [{"time": <ns>, "event": <name>,
+                "from": <state>, "to": <state>}, ...]
+    """
+    access_check()
+    return jsonify({"trace": State.get_trace()})
+
+
+@app.route("/disabled", methods=["GET"])
+def rest_disabled():
+    """
+    Return the sensors disabled by the user.
+
+    Returns:
+        str: JSON with the following structure
+            "disabled": [<sensor-name>, ...]
+    """
+    access_check()
+    return jsonify({"disabled": disabled_sensors.get_names()})
+
+
+@app.route("/syslog", methods=["GET"])
+def rest_syslog():
+    """
+    Return the counters of the asynchronous system logger.
+
+    Returns:
+        str: JSON with the following structure
+            "logged": <records>, "suppressed": <repetitions>,
+            "dropped": <messages>, "queued": <messages>
+    """
+    access_check()
+    return jsonify(syslog_worker.get_counters())
+
+
+def get_port_records(ports):
+    """
+    Return the details of the specified ports, obtaining the values
+    of all sensors, and of all actuators, with a single bulk read each.
+
+    Args:
+        ports (list): The ports, in the order of Port.ports.
+
+    Returns:
+        list: A dict for each port with its "name", "type" ("sensor" or
+            "actuator"), and "value"; sensors also have their "event"
+            name, trigger "count", and "disabled" status, which are
+            None for actuators.
+    """
+    snapshot = SensorSnapshot()
+    actuator_values = None
+    records = []
+    for port in ports:
+        if port.is_sensor():
+            records.append(
+                {
+                    "name": port.name,
+                    "type": "sensor",
+                    "value": port.get_value(snapshot),
+                    "event": port.get_event_name(),
+                    "count": port.get_count(),
+                    "disabled": port.user_disabled(),
+                }
+            )
+        else:
+            if actuator_values is None:
+                actuator_values = dict(
+                    zip(Port.actuators, ActuatorPort.read_values())
+                )
+            records.append(
+                {
+                    "name": port.name,
+                    "type": "actuator",
+                    "value": actuator_values[port],
+                    "event": None,
+                    "count": None,
+                    "disabled": None,
+                }
+            )
+    return records
+
+
+def select_ports(ports):
+    """
+    Return the specified ports that match the request's filters:
+    one or more name parameters, and a type parameter (sensor or
+    actuator).
+    """
+    names = request.args.getlist("name")
+    port_type = request.args.get("type")
+    if port_type not in (None, "sensor", "actuator"):
+        abort(400)  # Bad request
+    return [
+        port
+        for port in ports
+        if (not names or port.name in names)
+        and (port_type is None or port.is_sensor() == (port_type == "sensor"))
+    ]
+
+
+@app.route("/ports", methods=["GET"])
+def rest_ports():
+    """
+    Return the details of all ports, or of those matching the
+    name (repeatable) and type (sensor or actuator) parameters,
+    obtained with a single bulk read of their values.
+
+    Returns:
+        str: JSON with the following structure
+            "ports": [{"name": <port-name>, "type": <port-type>,
+                "value": <port-value>, "event": <event-name>,
+                "count": <trigger-count>, "disabled": <bool>}, ...]
+    """
+    access_check()
+    return jsonify({"ports": get_port_records(select_ports(Port.ports))})
+
+
+@app.route("/sensors", methods=["GET"])
+def rest_sensors():
+    """
+    Return the details of all sensors, or of those matching the
+    name (repeatable) parameters, obtained with a single bulk read
+    of their values.
+
+    Returns:
+        str: JSON with the structure returned by /ports, under "sensors"
+    """
+    access_check()
+    return jsonify({"sensors": get_port_records(select_ports(Port.sensors))})
+
+
 @app.route("/sensor/<name>", methods=["GET"])
 def rest_sensor(name):
     """
@@ -72,3 +255,69 @@ def rest_sensor(name):
     if not sensor_port or not sensor_port.is_sensor():
         abort(404)  # Not found
     return jsonify({"value": sensor_port.get_value()})
+
+
+def stream_messages(after, kinds):
+    """
+    Generate the Server-Sent Events of the messages published after
+    the specified one, interspersed with keep-alive comments.
+
+    Args:
+        after (int): The sequence number of the last message received.
+        kinds (set): The kinds of the messages to send.
+
+    Yields:
+        str: The text of each event or comment.
+    """
+    while True:
+        messages = broadcaster.get_messages(after, KEEPALIVE_INTERVAL)
+        if not messages:
+            yield ": keepalive\n\n"
+            continue
+        for sequence, kind, data in messages:
+            if kind in kinds:
+                yield (
+                    f"id: {sequence}\nevent: {kind}\n"
+                    f"data: {json.dumps(data)}\n\n"
+                )
+        after = messages[-1][0]
+
+
+@app.route("/stream", methods=["GET"])
+def rest_stream():
+    """
+    Stream the state transitions as they occur, as Server-Sent Events.
+    With the sensors=1 parameter the events queued by sensors are also
+    streamed.
+    Clients resume after the event whose id they pass in a
+    Last-Event-ID header, or in a last_id parameter; otherwise streaming
+    starts with the next event.
+    Each stream occupies one of the REST server's threads.
+
+    Returns:
+        Response: A text/event-stream of events with the following
+            structure
+            id: <sequence number>
+            event: transition
+            data: {"time": <ns>, "event": <name>,
+                "from": <state>, "to": <state>}
+            or, for sensors,
+            event: sensor
+            data: {"sensor": <sensor-name>, "event": <name>}
+    """
+    access_check()
+    last_id = request.headers.get("Last-Event-ID", request.args.get("last_id"))
+    if last_id is None:
+        after = broadcaster.get_sequence()
+    elif last_id.isdigit():
+        after = int(last_id)
+    else:
+        abort(400)  # Bad request
+    kinds = {"transition"}
+    if request.args.get("sensors") == "1":
+        kinds.add("sensor")
+    return Response(
+        stream_messages(after, kinds),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
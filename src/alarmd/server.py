@@ -0,0 +1,90 @@
+"""
+Serve the REST interface through a WSGI server that handles requests
+on a fixed pool of threads, over TCP or a Unix domain socket.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+# The address and port the REST interface listens on by default
+HOST = "127.0.0.1"
+PORT = 5000
+
+# Permissions of the Unix domain socket; access is controlled through them
+SOCKET_MODE = 0o660
+
+
+class RequestHandler(WSGIRequestHandler):
+    """Handle requests of persistent connections until they idle."""
+
+    # Seconds after which an idle connection is closed, freeing its thread
+    timeout = 5
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """
+    A WSGI server handling each connection on a thread of a fixed pool,
+    thereby bounding the threads serving a load of polling clients and
+    avoiding the cost of starting a thread per request.
+    """
+
+    multithread = True
+
+    def __init__(self, host, port, app, threads=8):
+        """
+        Bind the server to the specified address.
+
+        Args:
+            host (str): The address to listen on, or unix://PATH for
+                a Unix domain socket.
+            port (int): The TCP port to listen on; 0 for any free one.
+            app (Flask): The WSGI application to serve.
+            threads (int): The number of threads serving connections.
+        """
+        # Created first, because a failing bind closes the server
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix="rest"
+        )
+        super().__init__(host, port, app, handler=RequestHandler)
+        if host.startswith("unix://"):
+            os.chmod(self.server_address, SOCKET_MODE)
+
+    def process_request(self, request, client_address):
+        """Handle the specified connection on a thread of the pool."""
+        self.executor.submit(
+            self.process_request_thread, request, client_address
+        )
+
+    def process_request_thread(self, request, client_address):
+        """Pool thread function handling the specified connection."""
+        try:
+            self.finish_request(request, client_address)
+        except Exception:  # pylint: disable=broad-exception-caught
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        """Close the listening socket and stop the pool's threads."""
+        super().server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def make_server(app, threads=8, socket_path=None):
+    """
+    Return a server for the specified application.
+
+    Args:
+        app (Flask): The WSGI application to serve.
+        threads (int): The number of threads serving connections.
+        socket_path (str): The path of a Unix domain socket to listen
+            on, instead of the loopback TCP port.
+
+    Returns:
+        PooledWSGIServer: The server, bound and listening.
+    """
+    if socket_path:
+        return PooledWSGIServer(f"unix://{socket_path}", 0, app, threads)
+    return PooledWSGIServer(HOST, PORT, app, threads)
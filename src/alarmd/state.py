@@ -1,17 +1,102 @@
 """State transition engine for handling the DSL-specified configuration."""
 
+import ast
 import os
-import threading
-from time import sleep
+from collections import deque
+from time import monotonic, monotonic_ns
+from types import CodeType
 
 
 from alarmd.debug import Debug
+from .broadcast import broadcaster
 from .event_queue import event_queue
+from .timer import timer_scheduler
+from .trace import TraceBuffer
+
+
+def relocate_code(code, offset):
+    """
+    Return the specified code object with its line numbers, and those
+    of the code objects nested in it, incremented by the specified offset.
+    """
+    constants = tuple(
+        (
+            relocate_code(constant, offset)
+            if isinstance(constant, CodeType)
+            else constant
+        )
+        for constant in code.co_consts
+    )
+    return code.replace(
+        co_firstlineno=code.co_firstlineno + offset, co_consts=constants
+    )
+
+
+# Number of entry actions compiled together by State.compile_actions().
+# Identical actions compiled together make the compiler's constant
+# merging quadratic, so keep this small.
+ACTION_BATCH_SIZE = 256
+
+
+class BatchStatistics:
+    """Accounting of the event batches processed."""
+
+    def __init__(self, history=100):
+        """
+        Initialize the statistics.
+
+        Args:
+            history (int): The number of recent batches to keep.
+        """
+        self.batches = 0
+        self.events = 0
+        self.max_size = 0
+        self.wait_time = 0.0
+        self.processing_time = 0.0
+        # (size, wait time, processing time) tuples of recent batches
+        self.recent = deque(maxlen=history)
+
+    def record(self, size, wait_time, processing_time):
+        """
+        Account for a processed batch.
+
+        Args:
+            size (int): The number of events in the batch.
+            wait_time (float): Seconds spent waiting for the batch.
+            processing_time (float): Seconds spent processing the batch.
+
+        Returns:
+            None
+        """
+        self.batches += 1
+        self.events += size
+        self.max_size = max(self.max_size, size)
+        self.wait_time += wait_time
+        self.processing_time += processing_time
+        self.recent.append((size, wait_time, processing_time))
+
+    def get_counters(self):
+        """
+        Return the batch accounting totals.
+
+        Returns:
+            dict: Number of batches and events, the largest batch size,
+                and the total waiting and processing time.
+        """
+        return {
+            "batches": self.batches,
+            "events": self.events,
+            "max_size": self.max_size,
+            "wait_time": self.wait_time,
+            "processing_time": self.processing_time,
+        }
 
 
 class State:
     """State transition engine."""
 
+    # pylint: disable=too-many-instance-attributes,too-many-public-methods
+
     # Map from state name to state instance
     states_by_name = {}
 
@@ -21,6 +106,25 @@ class State:
     # Event processing common to all states
     all_states = None
 
+    # Map from event name to its dense integer identifier,
+    # established by finalize()
+    event_ids = {}
+
+    # Event identifiers of the direct (non-event) transition
+    # and of events without a transition
+    DIRECT_EVENT = -1
+    UNKNOWN_EVENT = -2
+
+    # State and event names indexed by their identifiers
+    states_by_id = []
+    event_names = []
+
+    # Accounting of batched event processing
+    batch_statistics = BatchStatistics()
+
+    # Recent event processing records
+    trace_buffer = TraceBuffer()
+
     @classmethod
     def get_state(cls):
         """
@@ -39,41 +143,224 @@ class State:
         """Initialize global state variables."""
         cls.state = None
         cls.states_by_name = {}
+        cls.event_ids = {}
+        cls.states_by_id = []
+        cls.event_names = []
+        cls.trace_buffer.reset()
+        broadcaster.reset()
         cls.all_states = State("*")
 
     @classmethod
-    def event_processor(cls, initial_state_name):
+    def finalize(cls):
+        """
+        Compile the configured transitions into the dispatch tables
+        used for processing events.
+        States and events are given dense integer identifiers.
+        Each state gets a table indexed by event identifier, which
+        points directly to the state objects to transition to.
+        The tables have the transitions common to all states (*) merged
+        in; as in the DSL, these take precedence over the state's own ones.
+        This must be called after the configuration has been read
+        and before events are processed.
+
+        Args:
+            None
+
+        Returns:
+            list: (state name, target state name) tuples of transitions
+                to undefined states, which are ignored.
+        """
+        cls.event_ids = {}
+        for state in cls.states_by_name.values():
+            for event_name in state.event_transitions:
+                if event_name is not None:
+                    cls.event_ids.setdefault(event_name, len(cls.event_ids))
+        cls.event_names = list(cls.event_ids)
+        cls.states_by_id = list(cls.states_by_name.values())
+
+        undefined = []
+        for state_id, state in enumerate(cls.states_by_name.values()):
+            state.state_id = state_id
+            state.transitions = [None] * len(cls.event_ids)
+            state.direct_transition = None
+
+            transitions = dict(state.event_transitions)
+            transitions.update(cls.all_states.event_transitions)
+            for event_name, state_name in transitions.items():
+                new_state = cls.states_by_name.get(state_name)
+                if not new_state:
+                    undefined.append((state.name, state_name))
+                elif event_name is not None:
+                    state.transitions[cls.event_ids[event_name]] = new_state
+                elif None in state.event_transitions:
+                    state.direct_transition = new_state
+        return undefined
+
+    @classmethod
+    def event_processor(cls, initial_state_name, batching=False):
         """
         Process events from the queue through the configured state machine,
         starting from the specified initial state.
+        In batching mode, once woken, all events already queued are
+        removed together and processed in order, and each batch's size,
+        waiting time, and processing time are recorded.
 
         Args:
             initial_state_name (str): The state from which to start processing.
+            batching (bool): True to process events in batches.
 
         Returns:
             None
         """
         cls.state = cls.get_instance_by_name(initial_state_name)
         cls.state.enter()
+        done = cls.states_by_name.get("DONE")
+
+        # Events of the current batch that remain to be processed
+        batch = deque()
+        batch_size = 0
+        batch_start = None
+        wait_time = 0.0
 
         Debug.log("Starting event processing loop...")
-        while cls.state.get_name() != "DONE":
-            Debug.log(f"{cls.state=}")
-            Debug.log(f"{cls.all_states=}")
-            if not cls.state.has_direct_transition():
+        while cls.state is not done:
+            Debug.log(lambda: f"{cls.state=}")
+            Debug.log(lambda: f"{cls.all_states=}")
+            if cls.state.direct_transition is not None:
+                # Execute entry actions and default transition
+                event = None
+            elif not batching:
                 # Block until an event is available
                 event = event_queue.get()
             else:
-                # Execute entry actions and default transition
-                event = None
-            Debug.log(f"Process event {event}")
-            new_state_name = cls.state.process_event(event)
-            Debug.log(f"{new_state_name=}")
-            new_state = cls.get_instance_by_name(new_state_name)
-            Debug.log(f"Enter {new_state}")
-            if new_state != cls.state:
-                cls.state = new_state
-                cls.state.enter()
+                if not batch:
+                    wait_start = monotonic()
+                    if batch_start is not None:
+                        cls.batch_statistics.record(
+                            batch_size, wait_time, wait_start - batch_start
+                        )
+                    # Block until events are available
+                    batch.extend(event_queue.get_all())
+                    batch_start = monotonic()
+                    batch_size = len(batch)
+                    wait_time = batch_start - wait_start
+                event = batch.popleft()
+            new_state = cls.handle_event(event)
+            if new_state is not None:
+                new_state.enter()
+
+        if batch_start is not None:
+            cls.batch_statistics.record(
+                batch_size, wait_time, monotonic() - batch_start
+            )
+        # Leave unprocessed events for a subsequent invocation
+        event_queue.unget_all(list(batch))
+
+    @classmethod
+    def handle_event(cls, event):
+        """
+        Process the specified event in the current state, making the
+        state it leads to, if any, the current one.
+        The timers armed by the state that was left are cancelled,
+        and the transition is published to the streaming clients.
+
+        Args:
+            event (str|None): The event's name; None for the
+                direct (non-event) transition.
+
+        Returns:
+            State: The new current state, whose entry actions the
+                caller shall perform.
+            None: If the current state hasn't changed.
+        """
+        Debug.log("Process event", event)
+        event_id = cls.get_event_id(event)
+        new_state = cls.state.dispatch(event_id)
+        # Kernel timestamp and line of the event's GPIO edge, if any
+        edge_timestamp = getattr(event, "timestamp_ns", None)
+        if edge_timestamp is None:
+            edge_timestamp, line_offset = 0, -1
+        else:
+            line_offset = event.line_offset
+        cls.trace_buffer.record(
+            event_id,
+            cls.state.state_id,
+            cls.state.state_id if new_state is None else new_state.state_id,
+            edge_timestamp,
+            line_offset,
+        )
+        if new_state is None or new_state is cls.state:
+            return None
+        Debug.log("Enter", new_state)
+        timer_scheduler.cancel(cls.state)
+        broadcaster.publish(
+            "transition",
+            {
+                "time": monotonic_ns(),
+                "event": event,
+                "from": cls.state.name,
+                "to": new_state.name,
+            },
+        )
+        cls.state = new_state
+        return new_state
+
+    @classmethod
+    def get_event_id(cls, event_name):
+        """
+        Return the identifier of the specified event.
+
+        Args:
+            event_name (str|None): The event's name; None for the
+                direct (non-event) transition.
+
+        Returns:
+            int: The event's identifier, DIRECT_EVENT for the direct
+                transition, or UNKNOWN_EVENT if no state handles it.
+        """
+        if event_name is None:
+            return cls.DIRECT_EVENT
+        return cls.event_ids.get(event_name, cls.UNKNOWN_EVENT)
+
+    @classmethod
+    def get_trace(cls):
+        """
+        Return the recently processed events.
+
+        Returns:
+            list: Dicts with each record's monotonic clock timestamp
+                in nanoseconds, event name, and from and to state names.
+                Direct transitions have a None event, and events not
+                handled by any state an empty one.
+                Events caused by GPIO edges also have the edge's
+                kernel timestamp ("edge_time", in the same clock)
+                and line offset ("line"); other events have None.
+        """
+        special_names = {cls.DIRECT_EVENT: None, cls.UNKNOWN_EVENT: ""}
+        result = []
+        for (
+            timestamp,
+            event_id,
+            from_id,
+            to_id,
+            edge_timestamp,
+            line_offset,
+        ) in cls.trace_buffer.get_records():
+            result.append(
+                {
+                    "time": timestamp,
+                    "event": (
+                        cls.event_names[event_id]
+                        if event_id >= 0
+                        else special_names[event_id]
+                    ),
+                    "from": cls.states_by_id[from_id].name,
+                    "to": cls.states_by_id[to_id].name,
+                    "edge_time": edge_timestamp or None,
+                    "line": None if line_offset < 0 else line_offset,
+                }
+            )
+        return result
 
     @classmethod
     def get_instance_by_name(cls, name):
@@ -92,17 +379,20 @@ class State:
         """Constructor to initialize the instance field."""
         self.name = name
         self.counter = 0
+        # Entry action source code and the corresponding compiled functions
         self.entry_actions = []
+        self.entry_functions = []
         self.event_transitions = {}
+        # Dispatch tables established by finalize()
+        self.state_id = None
+        self.transitions = []
+        self.direct_transition = None
         State.states_by_name[name] = self
 
     def has_direct_transition(self):
         """Return true if the state has a direct (non-event)
         transition associated with it."""
-        for k in self.event_transitions:
-            if not k:
-                return True
-        return False
+        return self.direct_transition is not None
 
     def get_name(self):
         """Return the state's name."""
@@ -112,9 +402,130 @@ class State:
         """Zero the state entries counter."""
         self.counter = 0
 
-    def add_entry_action(self, command):
-        """Add the specified command string as an entry action."""
+    def add_entry_action(
+        self, command, file_name="<string>", line_number=1, function=None
+    ):
+        """
+        Compile the specified command string and add it as an entry action.
+
+        Args:
+            command (str): The Python expression to evaluate on entry.
+            file_name (str): The file where the command was specified.
+            line_number (int): The line where the command was specified.
+            function (function): The command's already compiled function;
+                None to compile it.
+
+        Returns:
+            None
+
+        Raises:
+            SyntaxError: If the command is not a valid Python expression.
+        """
+        if function is None:
+            function = State.compile_action(command, file_name, line_number)
         self.entry_actions.append(command)
+        self.entry_functions.append(function)
+
+    @staticmethod
+    def compile_action(command, file_name, line_number):
+        """
+        Compile an entry action expression into a function taking the
+        entered state as its (self) argument.
+        The function is evaluated in this module's namespace, which is
+        also the one where the DSL's Python blocks are executed.
+
+        Args:
+            command (str): The Python expression to compile.
+            file_name (str): The file where the command was specified.
+            line_number (int): The line where the command was specified.
+
+        Returns:
+            function: A function that evaluates the expression.
+
+        Raises:
+            SyntaxError: If the command is not a valid Python expression.
+        """
+        expression = ast.parse(command, filename=file_name, mode="eval")
+        function = ast.parse("lambda self: None", mode="eval")
+        function.body.body = expression.body
+        ast.increment_lineno(function, line_number - 1)
+        code = compile(function, file_name, "eval")
+        # pylint: disable-next=eval-used
+        return eval(code, globals())
+
+    @staticmethod
+    def compile_actions(actions, file_name):
+        """
+        Compile multiple entry action expressions, like compile_action(),
+        but with one invocation of the Python compiler for each batch of
+        ACTION_BATCH_SIZE expressions.
+        The expressions are laid out as the elements of a list, each
+        starting on its specified line.
+
+        Args:
+            actions (list): (command, line number) tuples, ordered by
+                line number, with at most one command on each line.
+            file_name (str): The file where the commands were specified.
+
+        Returns:
+            list: The functions that evaluate the expressions.
+
+        Raises:
+            SyntaxError: If a command is not a valid Python expression.
+        """
+        functions = []
+        for start in range(0, len(actions), ACTION_BATCH_SIZE):
+            batch = actions[start : start + ACTION_BATCH_SIZE]
+            functions += State.compile_action_batch(batch, file_name)
+        return functions
+
+    @staticmethod
+    def compile_action_batch(actions, file_name):
+        """Compile a batch of entry actions for compile_actions()."""
+        functions = None
+        try:
+            # Commands must be self-contained expressions, rather than
+            # ones that only become valid when wrapped in parentheses
+            for command, _ in actions:
+                ast.parse(command, mode="eval")
+            functions = State.compile_action_list(actions, file_name)
+        except SyntaxError:
+            pass
+        if functions is not None and len(functions) == len(actions):
+            return functions
+        # Compile one by one, to report the first erroneous command
+        return [
+            State.compile_action(command, file_name, line_number)
+            for command, line_number in actions
+        ]
+
+    @staticmethod
+    def compile_action_list(actions, file_name):
+        """
+        Compile the specified entry actions as the elements of a list,
+        each starting on its specified line.
+
+        Returns:
+            list: The functions that evaluate the expressions, or None
+                if two commands are on the same line.
+
+        Raises:
+            SyntaxError: If the list is not a valid Python expression.
+        """
+        first_line_number = actions[0][1] if actions else 1
+        lines = [""]
+        for command, line_number in actions:
+            line_index = line_number - first_line_number
+            if line_index < len(lines) - 1:
+                return None
+            lines += [""] * (line_index - len(lines) + 1)
+            lines[-1] += f"lambda self: ({command}"
+            lines.append("),")
+        source = "[" + "\n".join(lines) + "]"
+        code = compile(source, file_name, "eval")
+        code = relocate_code(code, first_line_number - 1)
+        # pylint: disable-next=eval-used
+        return eval(code, globals())
 
     def add_event_transition(self, event_name, state_name):
         """Transition to the specified state given an event."""
@@ -123,10 +534,9 @@ class State:
     def enter(self):
         """Perform the state's entry actions."""
         self.counter += 1
-        for action in self.entry_actions:
-            Debug.log(f"Evaluate {action}")
-            # pylint: disable-next=eval-used
-            eval(action)
+        for command, function in zip(self.entry_actions, self.entry_functions):
+            Debug.log("Evaluate", command)
+            function(self)
 
     def has_event_transition(self, event_name):
         """Return true if the state directly (not via all_states)
@@ -134,11 +544,36 @@ class State:
         return bool(self.event_transitions.get(event_name))
 
     def process_event(self, event_name):
-        """Transition on the specified event; return the new state name."""
-        if self != State.all_states:
-            if new_state_name := State.all_states.process_event(event_name):
-                return new_state_name
-        return self.event_transitions.get(event_name)
+        """
+        Return the state to transition to on the specified event.
+
+        Args:
+            event_name (str|None): The event's name; None for the
+                direct (non-event) transition.
+
+        Returns:
+            State: The new state.
+            None: If the state has no transition for the event.
+        """
+        return self.dispatch(State.get_event_id(event_name))
+
+    def dispatch(self, event_id):
+        """
+        Return the state to transition to on the specified event.
+
+        Args:
+            event_id (int): The event's identifier, as returned by
+                get_event_id().
+
+        Returns:
+            State: The new state.
+            None: If the state has no transition for the event.
+        """
+        if event_id >= 0:
+            return self.transitions[event_id]
+        if event_id == State.DIRECT_EVENT:
+            return self.direct_transition
+        return None
 
     def __eq__(self, other):
         """Check equality based on the name."""
@@ -189,8 +624,10 @@ State.all_states = State("*")
 # DSL API functions
 def register_timer_event(delay, event_name):
     """
-    Setup a thread to deliver an event named TIMER_N after the specified
+    Arrange for an event named TIMER_N to be delivered after the specified
     N second delay.
+    The timer is owned by the current state, and is cancelled when
+    the state is left.
 
     Args:
         delay (int): The number of seconds to delay
@@ -199,15 +636,7 @@ def register_timer_event(delay, event_name):
     Returns:
         None
     """
-
-    def enqueue_event_after(delay, event_name):
-        sleep(delay)
-        event_queue.put(event_name)
-
-    thread = threading.Thread(
-        target=enqueue_event_after, args=(delay, event_name), daemon=True
-    )
-    thread.start()
+    timer_scheduler.schedule(delay, event_name, State.state)
 
 
 def unlink(file_path):
@@ -0,0 +1,31 @@
+"""Publication of status documents for external readers."""
+
+import json
+import os
+import syslog
+
+from .syslogger import syslog_worker
+
+
+def write_document(path, document):
+    """
+    Write the specified document as compact JSON to the specified file,
+    replacing it atomically, so that readers never see a partially
+    written document.
+
+    Args:
+        path (str): The file to write.
+        document (dict): The document to write.
+
+    Returns:
+        bool: True if the document was written.
+    """
+    temporary_path = path + ".tmp"
+    try:
+        with open(temporary_path, "w", encoding="utf-8") as output:
+            json.dump(document, output, separators=(",", ":"))
+        os.replace(temporary_path, path)
+    except OSError as exc:
+        syslog_worker.log(syslog.LOG_ERR, f"Failed to write {path}: {exc}")
+        return False
+    return True
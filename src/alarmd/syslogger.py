@@ -0,0 +1,152 @@
+"""Asynchronous, rate-limited system logging."""
+
+import queue
+import syslog
+import threading
+from time import monotonic
+
+
+class SyslogWorker:
+    """
+    Log messages through a dedicated thread, so that time-critical
+    code, such as the GPIO edge event handling, never waits for syslog.
+    Messages are handed over through a bounded queue; when this is full,
+    they are dropped and counted.
+    Repetitions of a message within a window after it has been logged
+    are suppressed, and then logged as a single summary record,
+    e.g. "trigger: Kitchen (disabled) x137 in 10s".
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, maxsize=1024, window=10):
+        """
+        Initialize the worker.
+
+        Args:
+            maxsize (int): The maximum number of messages waiting
+                to be logged.
+            window (float): Seconds during which repetitions of a
+                logged message are suppressed; zero to log them all.
+        """
+        self.queue = queue.Queue(maxsize)
+        self.window = window
+        self.thread = None
+        self.lock = threading.Lock()
+        # Map from (priority, message) to the window's end and the
+        # number of repetitions suppressed within it
+        self.windows = {}
+
+        self.logged = 0
+        self.suppressed = 0
+        self.dropped = 0
+
+    def reset(self):
+        """Discard the waiting messages and zero the counters."""
+        with self.queue.mutex:
+            self.queue.queue.clear()
+        self.windows.clear()
+        self.logged = 0
+        self.suppressed = 0
+        self.dropped = 0
+
+    def log(self, priority, message, deduplicate=True):
+        """
+        Arrange for the specified message to be logged, without blocking.
+
+        Args:
+            priority (int): The message's syslog priority.
+            message (str): The message to log.
+            deduplicate (bool): False to log the message even if it
+                repeats a recent one, e.g. because it records a change,
+                whose order relative to other messages matters.
+
+        Returns:
+            bool: False if the message was dropped.
+        """
+        if not self.thread:
+            with self.lock:
+                if not self.thread:
+                    self.thread = threading.Thread(
+                        target=self.run, daemon=True, name="syslog"
+                    )
+                    self.thread.start()
+        try:
+            self.queue.put_nowait(
+                (monotonic(), priority, message, deduplicate)
+            )
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def run(self):
+        """Thread function logging the queued messages."""
+        while True:
+            timeout = None
+            if self.windows:
+                timeout = max(
+                    0,
+                    min(end for end, _ in self.windows.values()) - monotonic(),
+                )
+            try:
+                record = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                record = None
+            self.process(record, monotonic())
+
+    def process(self, record, now):
+        """
+        Log the specified record, if it isn't a suppressed repetition,
+        and the summaries of the windows that ended.
+
+        Args:
+            record (tuple): The (time, priority, message, deduplicate)
+                to log; None for none.
+            now (float): The current monotonic time.
+
+        Returns:
+            None
+        """
+        for key, (end, count) in list(self.windows.items()):
+            if end <= now:
+                del self.windows[key]
+                if count:
+                    priority, message = key
+                    syslog.syslog(
+                        priority, f"{message} x{count} in {self.window:g}s"
+                    )
+                    self.logged += 1
+        if record is None:
+            return
+
+        time, priority, message, deduplicate = record
+        key = (priority, message)
+        window = self.windows.get(key) if deduplicate else None
+        if window:
+            self.windows[key] = (window[0], window[1] + 1)
+            self.suppressed += 1
+            return
+        syslog.syslog(priority, message)
+        self.logged += 1
+        if self.window and deduplicate:
+            self.windows[key] = (time + self.window, 0)
+
+    def get_counters(self):
+        """
+        Return the worker's counters.
+
+        Returns:
+            dict: The number of records logged, of messages suppressed
+                as repetitions, of messages dropped because the queue
+                was full, and of messages waiting to be logged.
+        """
+        return {
+            "logged": self.logged,
+            "suppressed": self.suppressed,
+            "dropped": self.dropped,
+            "queued": self.queue.qsize(),
+        }
+
+
+syslog_worker = SyslogWorker()
@@ -0,0 +1,212 @@
+"""Timer event scheduling."""
+
+import heapq
+import itertools
+import threading
+from time import monotonic
+
+from .event_queue import event_queue
+
+
+class Timer:
+    """A timer event scheduled for delivery at a monotonic clock deadline."""
+
+    # pylint: disable=too-few-public-methods
+
+    __slots__ = ("deadline", "event_name", "owner", "state")
+
+    # Timer states
+    PENDING = 0
+    FIRED = 1
+    CANCELLED = 2
+
+    def __init__(self, deadline, event_name, owner):
+        self.deadline = deadline
+        self.event_name = event_name
+        self.owner = owner
+        self.state = Timer.PENDING
+
+    def is_pending(self):
+        """Return true if the timer has neither fired nor been cancelled."""
+        return self.state == Timer.PENDING
+
+
+class TimerScheduler:
+    """
+    Deliver timer events to an event queue through a single thread
+    waiting on a min-heap of monotonic clock deadlines.
+    Each timer can have an owner (e.g. the state that armed it),
+    so that all of an owner's pending timers can be cancelled together.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, target_queue):
+        """
+        Initialize the scheduler.
+
+        Args:
+            target_queue (Queue): The queue in which to put expired events.
+        """
+        self.queue = target_queue
+        self.condition = threading.Condition()
+        self.thread = None
+        # Function to call instead of running the scheduler's thread
+        self.waker = None
+
+        # Entries are (deadline, sequence, Timer) tuples; the sequence
+        # number keeps timers with equal deadlines in scheduling order.
+        self.heap = []
+        self.sequence = itertools.count()
+        self.timers_by_owner = {}
+        # Cancelled timers still in the heap; they are removed lazily
+        self.cancelled_in_heap = 0
+
+        self.pending = 0
+        self.fired = 0
+        self.cancelled = 0
+
+    def reset(self):
+        """Discard all timers and zero the counters."""
+        with self.condition:
+            self.heap.clear()
+            self.timers_by_owner.clear()
+            self.cancelled_in_heap = 0
+            self.pending = 0
+            self.fired = 0
+            self.cancelled = 0
+            self.condition.notify()
+
+    def set_waker(self, waker):
+        """
+        Set a function to call whenever a timer is scheduled,
+        instead of using the scheduler's thread to deliver the events.
+        The function is then responsible for arranging expire() to be
+        called at the returned deadline, e.g. from an event loop.
+        The function is called with the scheduler's lock held,
+        so it must not block or access the scheduler.
+
+        Args:
+            waker (callable|None): The function to call; None for none.
+
+        Returns:
+            None
+        """
+        with self.condition:
+            self.waker = waker
+
+    def schedule(self, delay, event_name, owner=None):
+        """
+        Arrange for the specified event to be queued after a delay.
+
+        Args:
+            delay (float): The number of seconds to delay.
+            event_name (str): The name of the event to queue.
+            owner (object): The timer's owner, used for cancelling it.
+
+        Returns:
+            Timer: The scheduled timer.
+        """
+        timer = Timer(monotonic() + delay, event_name, owner)
+        with self.condition:
+            heapq.heappush(
+                self.heap, (timer.deadline, next(self.sequence), timer)
+            )
+            if owner is not None:
+                self.timers_by_owner.setdefault(owner, []).append(timer)
+            self.pending += 1
+            if self.waker:
+                self.waker()
+            elif not self.thread:
+                self.thread = threading.Thread(
+                    target=self.run, name="timers", daemon=True
+                )
+                self.thread.start()
+            self.condition.notify()
+        return timer
+
+    def cancel(self, owner):
+        """
+        Cancel all pending timers of the specified owner.
+
+        Args:
+            owner (object): The owner whose timers will be cancelled.
+
+        Returns:
+            int: The number of timers cancelled.
+        """
+        with self.condition:
+            count = 0
+            for timer in self.timers_by_owner.pop(owner, ()):
+                if timer.is_pending():
+                    timer.state = Timer.CANCELLED
+                    count += 1
+            self.pending -= count
+            self.cancelled += count
+            self.cancelled_in_heap += count
+
+            # Don't let flapping states fill the heap with dead timers
+            if self.cancelled_in_heap > len(self.heap) // 2:
+                self.heap = [e for e in self.heap if e[2].is_pending()]
+                heapq.heapify(self.heap)
+                self.cancelled_in_heap = 0
+        return count
+
+    def expire(self, now):
+        """
+        Remove the timers that have expired by the specified time
+        from the heap and return their events.
+        Must be called with the scheduler's condition lock held.
+
+        Args:
+            now (float): The current monotonic clock time.
+
+        Returns:
+            tuple: The list of the expired events' names and the deadline
+                of the next pending timer, or None if there is none.
+        """
+        events = []
+        while self.heap:
+            deadline, _, timer = self.heap[0]
+            if not timer.is_pending():
+                heapq.heappop(self.heap)
+                self.cancelled_in_heap -= 1
+                continue
+            if deadline > now:
+                return events, deadline
+            heapq.heappop(self.heap)
+            timer.state = Timer.FIRED
+            self.pending -= 1
+            self.fired += 1
+            events.append(timer.event_name)
+        return events, None
+
+    def run(self):
+        """Thread function to queue timer events when they expire."""
+        with self.condition:
+            while True:
+                events, deadline = self.expire(monotonic())
+                for event_name in events:
+                    self.queue.put(event_name)
+                if deadline is None:
+                    self.condition.wait()
+                else:
+                    self.condition.wait(deadline - monotonic())
+
+    def get_counters(self):
+        """
+        Return the scheduler's timer counters.
+
+        Returns:
+            dict: The number of pending, fired, and cancelled timers.
+        """
+        with self.condition:
+            return {
+                "pending": self.pending,
+                "fired": self.fired,
+                "cancelled": self.cancelled,
+            }
+
+
+# The scheduler for the DSL's timer events
+timer_scheduler = TimerScheduler(event_queue)
@@ -0,0 +1,93 @@
+"""Always-on ring buffer of recent state machine trace records."""
+
+import struct
+from time import monotonic_ns
+
+
+class TraceBuffer:
+    """
+    A fixed-size ring buffer of binary trace records.
+    Each record holds a monotonic clock timestamp in nanoseconds,
+    the integer identifiers of an event, the state it was processed
+    in, and the state it led to, and, for events caused by GPIO edges,
+    the edge's kernel timestamp and line offset.
+    Recording packs the record into a preallocated buffer,
+    so it can stay enabled in production.
+    """
+
+    # Timestamp, event id, from-state id, to-state id,
+    # edge timestamp (0 for none), edge line offset (-1 for none)
+    RECORD = struct.Struct("=qiiiqi")
+
+    def __init__(self, capacity=1024):
+        """
+        Initialize the buffer.
+
+        Args:
+            capacity (int): The number of records to keep.
+        """
+        self.capacity = capacity
+        self.buffer = bytearray(self.RECORD.size * capacity)
+        # Total number of records ever written
+        self.written = 0
+
+    def reset(self):
+        """Discard all records."""
+        self.written = 0
+
+    # pylint: disable-next=too-many-arguments,too-many-positional-arguments
+    def record(
+        self,
+        event_id,
+        from_state_id,
+        to_state_id,
+        edge_timestamp=0,
+        line_offset=-1,
+    ):
+        """
+        Add a record to the buffer, overwriting the oldest one if full.
+
+        Args:
+            event_id (int): The processed event's identifier.
+            from_state_id (int): The identifier of the state in which
+                the event was processed.
+            to_state_id (int): The identifier of the resulting state.
+            edge_timestamp (int): The monotonic clock timestamp in
+                nanoseconds of the GPIO edge that caused the event;
+                0 for none.
+            line_offset (int): The line offset of the GPIO edge that
+                caused the event; -1 for none.
+
+        Returns:
+            None
+        """
+        self.RECORD.pack_into(
+            self.buffer,
+            (self.written % self.capacity) * self.RECORD.size,
+            monotonic_ns(),
+            event_id,
+            from_state_id,
+            to_state_id,
+            edge_timestamp,
+            line_offset,
+        )
+        self.written += 1
+
+    def get_records(self):
+        """
+        Return the buffer's records.
+
+        Returns:
+            list: (timestamp, event id, from-state id, to-state id,
+                edge timestamp, edge line offset) tuples, ordered from
+                the oldest to the newest.
+        """
+        written = self.written
+        data = bytes(self.buffer)
+        count = min(written, self.capacity)
+        return [
+            self.RECORD.unpack_from(
+                data, (i % self.capacity) * self.RECORD.size
+            )
+            for i in range(written - count, written)
+        ]
@@ -0,0 +1,122 @@
+import asyncio
+import os
+from io import StringIO
+from unittest.mock import MagicMock, patch, call
+
+import pytest
+
+from alarmd.async_runtime import AsyncRuntime
+from alarmd.dsl import read_config
+from alarmd.event_queue import event_queue
+from alarmd.port import CHIP_PATH, Port, SensorPort
+from alarmd.rest import app
+from alarmd.state import State
+from alarmd.timer import timer_scheduler
+
+from test_state import SETUP, patch_port
+
+
+@pytest.fixture(autouse=True)
+def reset_globals():
+    """Fixture to reset global variables before each test."""
+    State.reset()
+    Port.reset()
+    event_queue.reset()
+    timer_scheduler.reset()
+
+
+async def http_get(address, path):
+    """Issue an HTTP GET request; return the status line and body."""
+    reader, writer = await asyncio.open_connection(*address)
+    writer.write(
+        f"GET {path} HTTP/1.1\r\nHost: localhost\r\n"
+        "Connection: close\r\n\r\n".encode()
+    )
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return head.split(b"\r\n")[0], body
+
+
+def test_events_and_timers():
+    mock_file = StringIO(SETUP + """
+initial:
+    | set_bit('Siren5', 1)
+    go_second > second
+    ;
+
+second:
+    | set_bit('Siren6', 0)
+    0.05s > DONE
+    ;
+    """)
+    initial_name = read_config(mock_file)
+    siren5 = Port.get_instance_by_name("Siren5")
+    siren6 = Port.get_instance_by_name("Siren6")
+    with patch_port(
+        siren5, "set_value"
+    ) as mock_siren5_set_value, patch_port(
+        siren6, "set_value"
+    ) as mock_siren6_set_value:
+        event_queue.put("go_second")
+        AsyncRuntime(app, port=0).run(initial_name)
+        mock_siren5_set_value.assert_has_calls([call(1)])
+        mock_siren6_set_value.assert_has_calls([call(0)])
+    assert State.get_state().get_name() == "DONE"
+    assert timer_scheduler.get_counters()["fired"] == 1
+
+
+def test_rest_on_loop():
+    mock_file = StringIO(SETUP + """
+*:
+    CmdQuit > DONE
+    ;
+
+initial:
+    ;
+    """)
+    initial_name = read_config(mock_file)
+
+    async def scenario():
+        runtime = AsyncRuntime(app, port=0)
+        task = asyncio.create_task(runtime.main(initial_name))
+        await runtime.started.wait()
+        address = runtime.http_server.get_address()
+
+        status, body = await http_get(address, "/state")
+        assert status == b"HTTP/1.1 200 OK"
+        assert b'"initial"' in body
+
+        status, _ = await http_get(address, "/cmd/NonExistent")
+        assert status == b"HTTP/1.1 404 NOT FOUND"
+
+        status, _ = await http_get(address, "/cmd/Quit")
+        assert status == b"HTTP/1.1 200 OK"
+        await asyncio.wait_for(task, 5)
+
+    asyncio.run(scenario())
+    assert State.get_state().get_name() == "DONE"
+
+
+def test_edge_events_on_loop():
+    mock_file = StringIO(SETUP + """
+SENSOR	    S04	28	81	1	Bedroom
+
+initial:
+    ActiveSensor > DONE
+    ;
+    """)
+    initial_name = read_config(mock_file)
+    read_fd, write_fd = os.pipe()
+
+    def read_edge_events(max_events=None):
+        os.read(read_fd, 1)
+        return [MagicMock(line_offset=81, timestamp_ns=1000)]
+
+    request = MagicMock(fd=read_fd, read_edge_events=read_edge_events)
+    SensorPort.set_sensor_event("Bedroom", "ActiveSensor")
+    os.write(write_fd, b"x")
+    AsyncRuntime(app, port=0).run(initial_name, {CHIP_PATH: request})
+    os.close(read_fd)
+    os.close(write_fd)
+    assert State.get_state().get_name() == "DONE"
@@ -0,0 +1,39 @@
+import json
+from unittest.mock import patch
+
+from alarmd import benchmark
+from alarmd.disabled import DisabledSensors
+from alarmd.port import Port
+from alarmd.state import State
+
+
+def test_synthetic_config():
+    initial_name = benchmark.load(benchmark.synthetic_config(5))
+    assert initial_name == "initial"
+    assert State.get_instance_by_name("state4").process_event(
+        "event0"
+    ) is State.get_instance_by_name("state0")
+    assert Port.get_instance_by_name("Sensor15").is_sensor()
+
+
+def test_bench_events():
+    result = benchmark.bench_events(100, batching=True)
+    assert result["events"] == 100
+    assert result["events_per_second"] > 0
+    assert State.get_state().get_name() == "DONE"
+
+
+def test_bench_results_json():
+    results = {
+        "parse": benchmark.bench_parse([2], repeat=1),
+        "enter": benchmark.bench_enter(2, repeat=10),
+        "rest": benchmark.bench_rest(repeat=2),
+    }
+    assert json.loads(json.dumps(results))["enter"]["count"] == 10
+
+
+def test_bench_simulated(tmp_path):
+    with patch("alarmd.port.disabled_sensors", DisabledSensors(tmp_path)):
+        result = benchmark.bench_simulated(100, duration=0.2)
+    assert result["rate"] == 1600
+    assert result["handled"] > 0
@@ -0,0 +1,50 @@
+import threading
+
+from alarmd.broadcast import Broadcaster
+
+
+def test_publish_get_messages():
+    broadcaster = Broadcaster()
+    assert broadcaster.publish("a", {"n": 1}) == 1
+    assert broadcaster.publish("b", {"n": 2}) == 2
+    assert broadcaster.get_sequence() == 2
+    assert broadcaster.get_messages(0) == [
+        (1, "a", {"n": 1}),
+        (2, "b", {"n": 2}),
+    ]
+    assert broadcaster.get_messages(1) == [(2, "b", {"n": 2})]
+    assert broadcaster.get_messages(2, timeout=0.01) == []
+
+
+def test_history_overflow():
+    """Test that messages leaving the history are skipped."""
+    broadcaster = Broadcaster(history=2)
+    for n in range(5):
+        broadcaster.publish("a", n)
+    assert [m[0] for m in broadcaster.get_messages(1)] == [4, 5]
+
+
+def test_reset_resume():
+    """Test that clients ahead of a restarted numbering get all."""
+    broadcaster = Broadcaster()
+    broadcaster.publish("a", 1)
+    broadcaster.reset()
+    broadcaster.publish("a", 2)
+    assert broadcaster.get_messages(7) == [(1, "a", 2)]
+
+
+def test_fan_out():
+    """Test that all waiting subscribers receive a message."""
+    broadcaster = Broadcaster()
+    received = []
+
+    def subscriber():
+        received.append(broadcaster.get_messages(0, timeout=5))
+
+    threads = [threading.Thread(target=subscriber) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    broadcaster.publish("a", 1)
+    for thread in threads:
+        thread.join()
+    assert received == [[(1, "a", 1)]] * 3
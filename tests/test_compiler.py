@@ -0,0 +1,121 @@
+import os
+from unittest.mock import patch, call
+
+import pytest
+
+from alarmd import compiler
+from alarmd.dsl import read_config
+from alarmd.event_queue import event_queue
+from alarmd.port import Port
+from alarmd.state import State
+
+from test_state import SETUP, SENSOR_SETUP, patch_port
+
+CONFIG = SETUP + SENSOR_SETUP + """
+*:
+    CmdQuit > DONE
+    ;
+
+initial:
+    | set_bit('Siren5', 1)
+    |=2 set_bit('Siren6', 1)
+    go_second > second
+    ;
+
+second:
+    | call called
+    10s > initial
+    > DONE
+    ;
+
+called:
+    | set_sensor_event("Bedroom", "ActiveSensor")
+    ;
+"""
+
+
+@pytest.fixture(autouse=True)
+def reset_globals():
+    """Fixture to reset global variables before each test."""
+    State.reset()
+    Port.reset()
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    """Fixture for a configuration file."""
+    path = tmp_path / "test.alr"
+    path.write_text(CONFIG)
+    return str(path)
+
+
+def snapshot():
+    """Return a description of the configured ports and states."""
+    return (
+        [
+            (p.name, p.pcb, p.physical, p.bcm, p.is_sensor())
+            for p in Port.ports
+        ],
+        {
+            name: (state.entry_actions, state.event_transitions)
+            for name, state in State.states_by_name.items()
+        },
+    )
+
+
+def test_compile_and_load(config_path):
+    cache_path = compiler.compile_config(config_path)
+    assert os.path.exists(cache_path)
+    expected = snapshot()
+
+    State.reset()
+    Port.reset()
+    with patch.object(compiler, "read_config") as mock_read_config:
+        initial_name = compiler.load_config(config_path)
+        mock_read_config.assert_not_called()
+    assert initial_name == "initial"
+    assert snapshot() == expected
+
+    siren5 = Port.get_instance_by_name("Siren5")
+    with patch_port(siren5, "set_value") as mock_siren5_set_value:
+        event_queue.put("go_second")
+        State.event_processor(initial_name)
+        mock_siren5_set_value.assert_has_calls([call(1)])
+    assert Port.get_instance_by_name("Bedroom").is_event_generating()
+
+
+def test_stale_cache(config_path):
+    compiler.compile_config(config_path)
+    with open(config_path, "a", encoding="utf-8") as config:
+        config.write("\nthird:\n    ;\n")
+
+    State.reset()
+    Port.reset()
+    valid, _ = compiler.load_compiled(config_path)
+    assert not valid
+    assert compiler.load_config(config_path) == "initial"
+    assert State.get_instance_by_name("third")
+
+
+def test_no_cache(config_path):
+    valid, _ = compiler.load_compiled(config_path)
+    assert not valid
+
+
+def test_port_options(tmp_path):
+    path = tmp_path / "options.alr"
+    path.write_text(
+        "SENSOR S01 27 0 0 Door chip=1 edge=falling min_pulse=50ms\n"
+        "SENSOR S02 26 7 1 Pir debounce=1s holdoff=30s\n"
+    )
+    compiler.compile_config(str(path))
+    Port.reset()
+    compiler.load_config(str(path))
+    door = Port.get_instance_by_name("Door")
+    pir = Port.get_instance_by_name("Pir")
+    assert (door.chip, door.edge, door.get_min_pulse()) == (
+        "/dev/gpiochip1",
+        "falling",
+        0.05,
+    )
+    assert (pir.debounce, pir.get_holdoff()) == (1, 30)
@@ -0,0 +1,84 @@
+import os
+import time
+
+import pytest
+
+from alarmd.disabled import (
+    DisabledSensors,
+    EVENT_HEADER,
+    IN_CREATE,
+    IN_DELETE,
+    IN_MOVED_TO,
+    IN_Q_OVERFLOW,
+)
+
+
+def notification(mask, name):
+    """Return the inotify event data for the specified name."""
+    encoded = name.encode() + b"\0" * (16 - len(name))
+    return EVENT_HEADER.pack(1, mask, 0, len(encoded)) + encoded
+
+
+def wait_for(condition):
+    """Wait up to two seconds for the specified condition to hold."""
+    deadline = time.monotonic() + 2
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_not_started(tmp_path):
+    disabled = DisabledSensors(str(tmp_path))
+    assert not disabled.is_disabled("Entrance")
+    (tmp_path / "Entrance").touch()
+    assert disabled.is_disabled("Entrance")
+    assert disabled.get_names() == ["Entrance"]
+
+
+def test_handle_notifications(tmp_path):
+    disabled = DisabledSensors(str(tmp_path))
+    disabled.handle_notifications(
+        notification(IN_CREATE, "Entrance")
+        + notification(IN_MOVED_TO, "Kitchen")
+    )
+    assert disabled.names == {"Entrance", "Kitchen"}
+
+    disabled.handle_notifications(notification(IN_DELETE, "Entrance"))
+    assert disabled.names == {"Kitchen"}
+    assert disabled.get_counters()["notifications"] == 3
+
+
+def test_overflow_rescans(tmp_path):
+    (tmp_path / "Bedroom").touch()
+    disabled = DisabledSensors(str(tmp_path))
+    disabled.handle_notifications(notification(IN_Q_OVERFLOW, ""))
+    assert disabled.names == {"Bedroom"}
+    assert disabled.rescans == 1
+
+
+def test_inotify_updates(tmp_path):
+    (tmp_path / "Bedroom").touch()
+    disabled = DisabledSensors(str(tmp_path), rescan_interval=60)
+    disabled.start()
+    assert disabled.is_disabled("Bedroom")
+    if not disabled.get_counters()["watched"]:
+        pytest.skip("inotify is not available")
+
+    (tmp_path / "Entrance").touch()
+    wait_for(lambda: disabled.is_disabled("Entrance"))
+    os.remove(tmp_path / "Bedroom")
+    wait_for(lambda: not disabled.is_disabled("Bedroom"))
+    assert disabled.get_names() == ["Entrance"]
+    # Updated without rescanning
+    assert disabled.rescans == 1
+
+
+def test_missing_directory(tmp_path):
+    path = tmp_path / "disable"
+    disabled = DisabledSensors(str(path), rescan_interval=0.05)
+    disabled.start()
+    assert not disabled.is_disabled("Entrance")
+
+    path.mkdir()
+    (path / "Entrance").touch()
+    wait_for(lambda: disabled.is_disabled("Entrance"))
@@ -2,7 +2,8 @@ import pytest
 from io import StringIO
 from unittest.mock import patch, call
 
-from alarmd.dsl import read_config
+from alarmd.dsl import parse, read_config
+from alarmd.dsl import EntryAction, StateDefinition, Transition
 from alarmd.port import Port, ActuatorPort
 from alarmd.state import State
 from alarmd import state
@@ -154,3 +155,209 @@ a = 42
     read_config(mock_file)
 
     assert eval("a", state.__dict__) == 42
+
+
+def test_entry_action_compiled():
+    mock_file = StringIO(
+        """astate:
+    |=2 first()
+    ;
+    """
+    )
+    read_config(mock_file)
+
+    astate = State.get_instance_by_name("astate")
+    with patch.dict(state.__dict__, {"first": lambda: 42}):
+        assert astate.entry_functions[0](astate) is None
+        astate.counter = 2
+        assert astate.entry_functions[0](astate) == 42
+
+
+def test_entry_action_syntax_error(capsys):
+    mock_file = StringIO(
+        """astate:
+    | first()
+    | second(
+    ;
+    """
+    )
+    mock_file.name = "test.alr"
+    with pytest.raises(SystemExit):
+        read_config(mock_file)
+    captured = capsys.readouterr()
+    assert "test.alr(3):" in captured.err
+    assert "1 errors" in captured.err
+
+
+def test_parse_positions():
+    mock_file = StringIO(
+        """# Comment
+%i pstate
+
+pstate:
+    | first()
+    go > pstate
+    ;
+    """
+    )
+    configuration, errors = parse(mock_file)
+
+    assert errors == []
+    initial, state_definition = configuration.definitions
+    assert initial.line == 2
+    assert state_definition == StateDefinition(
+        4,
+        "pstate",
+        [EntryAction(5, None, "first()"), Transition(6, "go", "pstate")],
+    )
+
+
+def test_all_errors_reported(capsys):
+    mock_file = StringIO(
+        """SENSOR	S01	x	0	0	Bad
+| orphan()
+estate:
+    | first(
+    oops
+    ;
+estate:
+    ;
+%{
+a = 1
+"""
+    )
+    mock_file.name = "test.alr"
+    with pytest.raises(SystemExit):
+        read_config(mock_file)
+    captured = capsys.readouterr()
+    for line_number in [1, 2, 4, 5, 7, 9]:
+        assert f"test.alr({line_number}):" in captured.err
+    assert "state estate already defined in line 3" in captured.err
+    assert "unterminated Python block" in captured.err
+    assert "6 errors" in captured.err
+
+
+def test_python_block_error_line(capsys):
+    mock_file = StringIO(
+        """%{
+a = 1
+b = undefined_name
+%}
+"""
+    )
+    mock_file.name = "test.alr"
+    with pytest.raises(SystemExit):
+        read_config(mock_file)
+    captured = capsys.readouterr()
+    assert "test.alr(3): name 'undefined_name' is not defined" in captured.err
+
+
+def test_entry_action_line_numbers():
+    # Enough identical actions to span multiple compilation batches
+    actions = [f"    | first()\n    event{i} > lstate\n" for i in range(300)]
+    mock_file = StringIO("lstate:\n" + "".join(actions) + "    ;\n")
+    read_config(mock_file)
+
+    lstate = State.get_instance_by_name("lstate")
+    assert len(lstate.entry_functions) == 300
+    for i, function in enumerate(lstate.entry_functions):
+        assert function.__code__.co_firstlineno == 2 + 2 * i
+    with patch.dict(state.__dict__, {"first": lambda: 42}):
+        assert lstate.entry_functions[299](lstate) == 42
+
+
+def test_read_config_chip_option():
+    mock_file = StringIO(
+        """SENSOR	S02	26	7	1	Entrance	chip=1
+SENSOR	S03	27	7	1	Hall
+ACTUATOR	A1	29	5	1	Siren0	chip=/dev/gpiochip2
+"""
+    )
+    read_config(mock_file)
+    assert Port.get_instance_by_name("Entrance").chip == "/dev/gpiochip1"
+    assert Port.get_instance_by_name("Hall").chip == "/dev/gpiochip0"
+    assert Port.get_instance_by_name("Siren0").chip == "/dev/gpiochip2"
+    assert Port.get_instance_by_bcm(7, "/dev/gpiochip1").name == "Entrance"
+
+
+def test_port_option_errors(capsys):
+    mock_file = StringIO(
+        """SENSOR	S02	26	7	1	Entrance	color=red
+SENSOR	S03	27	8	1	Hall	chip=1	chip=2
+"""
+    )
+    mock_file.name = "test.alr"
+    with pytest.raises(SystemExit):
+        read_config(mock_file)
+    captured = capsys.readouterr()
+    assert "test.alr(1): unknown port option color" in captured.err
+    assert "test.alr(2): port option chip repeated" in captured.err
+
+
+def test_transition_trailing_text():
+    mock_file = StringIO(
+        """first:
+    go > second  # comment
+    > DONE ;
+    ;
+second:
+    ;
+DONE:
+    ;
+"""
+    )
+    read_config(mock_file)
+    first = State.get_instance_by_name("first")
+    assert first.event_transitions == {"go": "second", None: "DONE"}
+
+
+def test_entry_action_unbalanced(capsys):
+    mock_file = StringIO(
+        """ustate:
+    | print('a')) or (print('b')
+    | first()
+    ;
+"""
+    )
+    mock_file.name = "test.alr"
+    with pytest.raises(SystemExit):
+        read_config(mock_file)
+    captured = capsys.readouterr()
+    assert "test.alr(2): unmatched ')'" in captured.err
+
+
+def test_read_config_filter_options():
+    mock_file = StringIO(
+        """SENSOR	S02	26	7	1	Door	edge=falling	debounce=5ms	min_pulse=.5s
+SENSOR	S03	27	8	1	Pir	holdoff=30s
+"""
+    )
+    read_config(mock_file)
+    door = Port.get_instance_by_name("Door")
+    assert door.edge == "falling"
+    assert door.debounce == 0.005
+    assert door.get_min_pulse() == 0.5
+    pir = Port.get_instance_by_name("Pir")
+    assert (pir.edge, pir.debounce, pir.get_holdoff()) == ("rising", 0.2, 30)
+
+
+def test_filter_option_errors(capsys):
+    mock_file = StringIO(
+        """SENSOR	S02	26	7	1	Door	debounce=5
+SENSOR	S03	27	8	1	Pir	edge=up
+SENSOR	S04	28	9	1	Hall	edge=both	min_pulse=1s
+ACTUATOR	A1	29	5	1	Siren	holdoff=1s
+"""
+    )
+    mock_file.name = "test.alr"
+    with pytest.raises(SystemExit):
+        read_config(mock_file)
+    captured = capsys.readouterr()
+    assert "test.alr(1): port option debounce: invalid duration 5" in (
+        captured.err
+    )
+    assert "test.alr(2): port option edge: invalid edge up" in captured.err
+    assert "test.alr(3): min_pulse requires a single edge" in captured.err
+    assert "test.alr(4): port option holdoff only applies to sensors" in (
+        captured.err
+    )
@@ -0,0 +1,105 @@
+import pytest
+
+from alarmd.event_queue import Event, EventQueue
+
+
+@pytest.fixture
+def queue():
+    """Fixture for a private coalescing event queue."""
+    return EventQueue()
+
+
+def test_event_is_name():
+    event = Event("ActiveSensor")
+    assert event == "ActiveSensor"
+    assert {"ActiveSensor": 1}[event] == 1
+    assert event.count == 1
+
+
+def test_no_coalescing_by_default(queue):
+    queue.put_coalesced("ActiveSensor")
+    queue.put_coalesced("ActiveSensor")
+    assert queue.qsize() == 2
+    assert queue.get().count == 1
+    assert queue.get_counters()["coalesced"] == 0
+
+
+def test_coalescing(queue):
+    queue.set_coalescing_window(60)
+    queue.put_coalesced("ActiveSensor")
+    queue.put_coalesced("ActiveSensor")
+    queue.put_coalesced("DelayedSensor")
+    queue.put_coalesced("ActiveSensor")
+    assert queue.qsize() == 2
+
+    event = queue.get()
+    assert event == "ActiveSensor"
+    assert event.count == 3
+    assert queue.get() == "DelayedSensor"
+    assert queue.get_counters() == {
+        "coalesced": 2,
+        "coalesced_by_event": {"ActiveSensor": 2},
+    }
+
+    # Events taken from the queue no longer absorb new ones
+    queue.put_coalesced("ActiveSensor")
+    assert queue.get().count == 1
+
+
+def test_coalescing_window(queue):
+    queue.set_coalescing_window(60)
+    event = queue.put_coalesced("ActiveSensor")
+    event.time -= 61
+    queue.put_coalesced("ActiveSensor")
+    assert queue.qsize() == 2
+
+
+def test_commands_not_coalesced(queue):
+    queue.set_coalescing_window(60)
+    queue.put("CmdDisarm")
+    queue.put_coalesced("CmdDisarm")
+    queue.put("CmdDisarm")
+    queue.put_coalesced("CmdDisarm")
+    assert queue.qsize() == 3
+
+
+def test_get_all(queue):
+    queue.put("a")
+    queue.put("b")
+    assert queue.get_all() == ["a", "b"]
+    assert queue.empty()
+
+    queue.put("c")
+    queue.unget_all(["a", "b"])
+    assert queue.get_all() == ["a", "b", "c"]
+
+
+def test_put_batch(queue):
+    queue.set_coalescing_window(60)
+    queued = queue.put_batch(
+        [
+            Event("ActiveSensor", timestamp_ns=10, line_offset=7),
+            Event("ActiveSensor", timestamp_ns=20, line_offset=7),
+            Event("OtherSensor", timestamp_ns=30, line_offset=8),
+        ]
+    )
+    assert queued[0] is queued[1]
+    events = queue.get_all()
+    assert events == ["ActiveSensor", "OtherSensor"]
+    # The first edge's timestamp is kept
+    assert (events[0].count, events[0].timestamp_ns) == (2, 10)
+    assert events[1].line_offset == 8
+
+
+def test_put_all(queue):
+    queue.set_coalescing_window(60)
+    queue.put_coalesced("ActiveSensor")
+    queue.put_all(["CmdDisarm", "ActiveSensor", "CmdDisarm"])
+    queue.put_all([])
+    assert queue.get_all() == [
+        "ActiveSensor",
+        "CmdDisarm",
+        "ActiveSensor",
+        "CmdDisarm",
+    ]
+    assert queue.get_counters()["coalesced"] == 0
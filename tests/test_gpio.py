@@ -0,0 +1,150 @@
+import select
+from io import StringIO
+from time import monotonic, monotonic_ns, sleep
+
+from unittest.mock import patch
+
+import gpiod
+import pytest
+
+from alarmd.disabled import DisabledSensors
+from alarmd.event_queue import event_queue
+from alarmd.gpio import SimulatedBackend, get_line_settings
+from alarmd.port import CHIP_PATH, ActuatorPort, Port, SensorPort
+
+
+@pytest.fixture(autouse=True)
+def reset_globals(tmp_path):
+    Port.reset()
+    event_queue.reset()
+    # Keep the daemon's cache of disabled sensors from starting
+    with patch("alarmd.port.disabled_sensors", DisabledSensors(tmp_path)):
+        yield
+    Port.reset()
+    event_queue.reset()
+
+
+def input_config(edge=gpiod.line.Edge.RISING):
+    return {
+        (7, 8): gpiod.LineSettings(
+            direction=gpiod.line.Direction.INPUT, edge_detection=edge
+        ),
+        5: gpiod.LineSettings(direction=gpiod.line.Direction.OUTPUT),
+    }
+
+
+def test_get_line_settings():
+    settings = get_line_settings(input_config())
+    assert sorted(settings) == [5, 7, 8]
+    assert settings[7] is settings[8]
+
+
+def test_read_script():
+    script = SimulatedBackend.read_script(StringIO("""# Entrance pulse
+0.5 7 1
+0.6 7 0  # released
+1 3 1 gpiochip1
+"""))
+    assert script == [
+        (0.5, CHIP_PATH, 7, 1),
+        (0.6, CHIP_PATH, 7, 0),
+        (1.0, "/dev/gpiochip1", 3, 1),
+    ]
+    with pytest.raises(ValueError):
+        SimulatedBackend.read_script(StringIO("1 7\n"))
+
+
+def test_scripted_events():
+    script = [
+        (0.01, CHIP_PATH, 7, 1),
+        (0.02, CHIP_PATH, 7, 0),
+        (0.03, CHIP_PATH, 8, 1),
+        (0.01, "/dev/gpiochip1", 8, 1),
+    ]
+    backend = SimulatedBackend(script=script)
+    start = monotonic_ns()
+    with backend.request_lines(
+        CHIP_PATH, input_config(gpiod.line.Edge.BOTH), 64
+    ) as request:
+        readable, _, _ = select.select([request.fd], [], [], 1)
+        assert readable
+        sleep(0.05)
+        events = request.read_edge_events()
+        assert [(e.line_offset, e.event_type) for e in events] == [
+            (7, gpiod.EdgeEvent.Type.RISING_EDGE),
+            (7, gpiod.EdgeEvent.Type.FALLING_EDGE),
+            (8, gpiod.EdgeEvent.Type.RISING_EDGE),
+        ]
+        # Timestamped with the scripted times, rather than delivery times
+        assert [(e.timestamp_ns - start) // 10_000_000 for e in events] == [
+            1,
+            2,
+            3,
+        ]
+        assert [e.global_seqno for e in events] == [1, 2, 3]
+        assert request.get_values([7, 8]) == [
+            gpiod.line.Value.INACTIVE,
+            gpiod.line.Value.ACTIVE,
+        ]
+        readable, _, _ = select.select([request.fd], [], [], 0)
+        assert not readable
+
+
+def test_edge_detection():
+    script = [(0, CHIP_PATH, 7, 1), (0, CHIP_PATH, 7, 0)]
+    backend = SimulatedBackend(script=script)
+    with backend.request_lines(CHIP_PATH, input_config(), 64) as request:
+        events = request.read_edge_events(10)
+    assert [e.event_type for e in events] == [gpiod.EdgeEvent.Type.RISING_EDGE]
+
+
+def test_buffer_overflow():
+    script = [(0, CHIP_PATH, 7, i % 2) for i in range(1, 21)]
+    backend = SimulatedBackend(script=script)
+    with backend.request_lines(CHIP_PATH, input_config(), 4) as request:
+        sleep(0.05)
+        assert len(request.read_edge_events()) == 4
+        assert request.overflows == 6
+
+
+def test_random_pulses():
+    backend = SimulatedBackend(rate=1000, pulse_width=1e-5, seed=1)
+    count = 0
+    with backend.request_lines(CHIP_PATH, input_config(), 1024) as request:
+        deadline = monotonic() + 0.2
+        while monotonic() < deadline:
+            count += len(request.read_edge_events())
+    # About 400 pulses on the two lines
+    assert 200 < count < 600
+
+
+def test_outputs():
+    backend = SimulatedBackend()
+    with backend.request_lines(CHIP_PATH, input_config(), 64) as request:
+        request.set_values({5: gpiod.line.Value.ACTIVE})
+        assert request.get_value(5) == gpiod.line.Value.ACTIVE
+        request.set_value(5, gpiod.line.Value.INACTIVE)
+        assert request.get_value(5) == gpiod.line.Value.INACTIVE
+    # Released requests return no events
+    assert request.read_edge_events() == []
+
+
+def test_end_to_end():
+    """Test that the daemon's watcher queues simulated sensor events."""
+    SensorPort("Entrance", "S02", 26, 7, "1")
+    SensorPort("Bell", "S03", 27, 7, "1", "/dev/gpiochip1")
+    ActuatorPort("Siren", "A1", 29, 5, "1")
+    SensorPort.set_sensor_event("*", "ActiveSensor")
+    script = [(0, CHIP_PATH, 7, 1), (0.01, "/dev/gpiochip1", 7, 1)]
+    Port.set_backend(SimulatedBackend(script=script))
+    with Port.request_lines():
+        ActuatorPort.set_bit("Siren", 1)
+        assert Port.requests[CHIP_PATH].get_value(5) == gpiod.line.Value.ACTIVE
+        events = []
+        deadline = monotonic() + 2
+        while len(events) < 2 and monotonic() < deadline:
+            events += event_queue.get_all(block=False)
+            sleep(0.01)
+        assert Port.get_instance_by_name("Bell").get_value() == 1
+    assert events == ["ActiveSensor", "ActiveSensor"]
+    assert [event.line_offset for event in events] == [7, 7]
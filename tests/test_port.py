@@ -1,8 +1,14 @@
+import json
+import os
+import time
+
 import pytest
 from unittest.mock import patch, MagicMock, mock_open
 
 from alarmd import debug, port
-from alarmd.port import ActuatorPort, Port, SensorPort
+from alarmd.port import ActuatorPort, Port, SensorPort, SensorSnapshot
+from alarmd.port import CHIP_PATH
+from alarmd.gpio import get_chip_path
 
 
 @pytest.fixture(autouse=True)
@@ -111,3 +117,397 @@ def test_list_ports(capsys):
     captured = capsys.readouterr()
     assert "TestSensor1 (sensor)" in captured.out
     assert "TestActuator (actuator)" in captured.out
+
+
+def test_lazy_debug_log(capsys):
+    """Test that lazy debug messages are only formatted when enabled."""
+    debug.Debug.disable()
+    debug.Debug.log(lambda: pytest.fail("formatted"))
+    debug.Debug.enable()
+    debug.Debug.log("Lazy", lambda: "message")
+    debug.Debug.disable()
+    captured = capsys.readouterr()
+    assert "Lazy message" in captured.err
+
+
+def test_handle_edge_events():
+    SensorPort("Entrance", "S02", 26, 7, "1")
+    SensorPort("Kitchen", "S16", 18, 24, "1")
+    SensorPort("Bedroom", "S04", 28, 31, "1")
+    SensorPort.set_sensor_event("Entrance", "ActiveSensor")
+    SensorPort.set_sensor_event("Kitchen", "KitchenSensor")
+    edge_events = [
+        MagicMock(line_offset=7, timestamp_ns=100),
+        MagicMock(line_offset=31, timestamp_ns=200),
+        MagicMock(line_offset=24, timestamp_ns=300),
+    ]
+    with patch("alarmd.port.event_queue") as mock_queue, patch(
+        "alarmd.port.broadcaster"
+    ) as mock_broadcaster:
+        SensorPort.handle_edge_events(edge_events)
+    mock_broadcaster.publish.assert_called_with(
+        "sensor", {"sensor": "Kitchen", "event": "KitchenSensor"}
+    )
+    # Bedroom has no event, so the others are queued together
+    mock_queue.put_batch.assert_called_once()
+    events = mock_queue.put_batch.call_args.args[0]
+    assert events == ["ActiveSensor", "KitchenSensor"]
+    assert [(e.timestamp_ns, e.line_offset) for e in events] == [
+        (100, 7),
+        (300, 24),
+    ]
+
+
+def test_read_values_emulated():
+    for i, value in enumerate([1, 0, 1]):
+        sensor = SensorPort(f"TestSensor{i}", "P1", i, 17 + i, True)
+        sensor.set_emulated_value(value)
+    ActuatorPort("TestActuator", "P2", 2, 30, True)
+    assert SensorPort.read_values() == 0b101
+    snapshot = SensorSnapshot()
+    assert [p.get_value(snapshot) for p in Port.sensors] == [1, 0, 1]
+
+
+def test_increment_sensors_single_request():
+    """Test that all sensor values are read with a single request."""
+    Port.set_emulated(False)
+    for i in range(3):
+        sensor = SensorPort(f"TestSensor{i}", "P1", i, 17 + i, True)
+        sensor.set_event_name("AlarmTriggered")
+    active = port.gpiod.line.Value.ACTIVE
+    inactive = port.gpiod.line.Value.INACTIVE
+    request = MagicMock()
+    request.get_values.return_value = [inactive, active, active]
+    with patch.dict(Port.requests, {CHIP_PATH: request}):
+        with patch("alarmd.port.open", mock_open()):
+            SensorPort.increment_sensors()
+    request.get_values.assert_called_once_with([17, 18, 19])
+    request.get_value.assert_not_called()
+    assert [p.get_count() for p in Port.sensors] == [0, 1, 1]
+
+
+def test_registry():
+    sensor = SensorPort("TestSensor", "P1", 1, 17, True)
+    actuator = ActuatorPort("TestActuator", "P2", 2, 5, True)
+    assert Port.sensors == [sensor]
+    assert Port.actuators == [actuator]
+    assert Port.get_instance_by_bcm(17) is sensor
+    assert Port.get_instance_by_bcm(5) is actuator
+    assert Port.get_instance_by_bcm(6) is None
+    assert Port.get_instance_by_bcm(99) is None
+    with pytest.raises(AttributeError):
+        sensor.unknown = 1
+
+
+def test_sensor_arrays():
+    sensors = [SensorPort(f"S{i}", "P1", i, 17 + i, True) for i in range(3)]
+    ActuatorPort("TestActuator", "P2", 2, 5, True)
+    SensorPort.set_sensor_event("*", "AlarmTriggered")
+    assert Port.sensor_event_names == ["AlarmTriggered"] * 3
+    assert all(sensor.is_event_generating() for sensor in sensors)
+
+    sensors[1].increment_count()
+    assert list(Port.sensor_counts) == [0, 1, 0]
+    with patch("alarmd.port.os.remove"):
+        SensorPort.zero_sensors()
+    assert list(Port.sensor_counts) == [0, 0, 0]
+
+
+def test_set_bits_emulated():
+    siren = ActuatorPort("Siren", "A1", 29, 5, True)
+    strobe = ActuatorPort("Strobe", "A2", 31, 6, True)
+    ActuatorPort.set_bits({"Siren": 1, "Strobe": 0})
+    assert siren.get_emulated_value() == 1
+    assert strobe.get_emulated_value() == 0
+
+
+def test_set_bits():
+    """Test that all values are set with a single request and log."""
+    ActuatorPort("Siren", "A1", 29, 5, True)
+    ActuatorPort("Strobe", "A2", 31, 6, True)
+    Port.set_emulated(False)
+    request = MagicMock()
+    with patch.dict(Port.requests, {CHIP_PATH: request}):
+        with patch("alarmd.port.syslog_worker.log") as mock_syslog:
+            ActuatorPort.set_bits({"Siren": 1, "Strobe": 0})
+    request.set_values.assert_called_once_with(
+        {
+            5: port.gpiod.line.Value.ACTIVE,
+            6: port.gpiod.line.Value.INACTIVE,
+        }
+    )
+    request.set_value.assert_not_called()
+    mock_syslog.assert_called_once()
+    assert "Siren on, Strobe off" in mock_syslog.call_args.args[1]
+    assert mock_syslog.call_args.kwargs == {"deduplicate": False}
+
+
+def test_get_chip_path():
+    assert get_chip_path("1") == "/dev/gpiochip1"
+    assert get_chip_path("gpiochip2") == "/dev/gpiochip2"
+    assert get_chip_path("/dev/gpiochip3") == "/dev/gpiochip3"
+
+
+def test_multiple_chips():
+    """Test that ports on different chips with the same offset coexist."""
+    sensor0 = SensorPort("S0", "P1", 1, 17, True)
+    sensor1 = SensorPort("S1", "P1", 2, 17, True, "/dev/gpiochip1")
+    assert Port.get_instance_by_bcm(17) is sensor0
+    assert Port.get_instance_by_bcm(17, "/dev/gpiochip1") is sensor1
+    assert Port.sensor_lines == {
+        CHIP_PATH: ([0], [17]),
+        "/dev/gpiochip1": ([1], [17]),
+    }
+
+    Port.set_emulated(False)
+    active = port.gpiod.line.Value.ACTIVE
+    inactive = port.gpiod.line.Value.INACTIVE
+    requests = {
+        CHIP_PATH: MagicMock(**{"get_values.return_value": [inactive]}),
+        "/dev/gpiochip1": MagicMock(**{"get_values.return_value": [active]}),
+    }
+    with patch.dict(Port.requests, requests):
+        assert SensorPort.read_values() == 0b10
+
+
+def test_set_bits_per_chip():
+    """Test that actuator writes are grouped by chip."""
+    ActuatorPort("Siren", "A1", 29, 5, True)
+    ActuatorPort("Strobe", "A2", 31, 6, True)
+    ActuatorPort("Bell", "A3", 1, 5, True, "/dev/gpiochip1")
+    Port.set_emulated(False)
+    requests = {CHIP_PATH: MagicMock(), "/dev/gpiochip1": MagicMock()}
+    with patch.dict(Port.requests, requests):
+        with patch("alarmd.port.syslog_worker.log"):
+            ActuatorPort.set_bits({"Siren": 1, "Strobe": 1, "Bell": 0})
+    requests[CHIP_PATH].set_values.assert_called_once_with(
+        {5: port.gpiod.line.Value.ACTIVE, 6: port.gpiod.line.Value.ACTIVE}
+    )
+    requests["/dev/gpiochip1"].set_values.assert_called_once_with(
+        {5: port.gpiod.line.Value.INACTIVE}
+    )
+
+
+def test_actuator_read_values():
+    """Test that actuator values are read with a request per chip."""
+    ActuatorPort("Siren", "A1", 29, 5, True)
+    ActuatorPort("Bell", "A3", 1, 5, True, "/dev/gpiochip1")
+    ActuatorPort("Strobe", "A2", 31, 6, True)
+    Port.get_instance_by_name("Strobe").set_value(1)
+    assert ActuatorPort.read_values() == [0, 0, 1]
+
+    Port.set_emulated(False)
+    active = port.gpiod.line.Value.ACTIVE
+    inactive = port.gpiod.line.Value.INACTIVE
+    requests = {CHIP_PATH: MagicMock(), "/dev/gpiochip1": MagicMock()}
+    requests[CHIP_PATH].get_values.return_value = [active, inactive]
+    requests["/dev/gpiochip1"].get_values.return_value = [active]
+    with patch.dict(Port.requests, requests):
+        assert ActuatorPort.read_values() == [1, 1, 0]
+    requests[CHIP_PATH].get_values.assert_called_once_with([5, 6])
+    requests["/dev/gpiochip1"].get_values.assert_called_once_with([5])
+
+
+def test_request_lines_per_chip():
+    """Test that each chip gets its own request, released together."""
+    SensorPort("S0", "P1", 1, 17, True)
+    ActuatorPort("Bell", "A3", 1, 5, True, "/dev/gpiochip1")
+    requests = [MagicMock(), MagicMock()]
+    for request in requests:
+        request.__enter__.return_value = request
+    with patch(
+        "alarmd.port.gpiod.request_lines", side_effect=requests
+    ) as mock_request:
+        with patch("alarmd.port.disabled_sensors"):
+            with Port.request_lines(watch=False):
+                assert Port.requests == {
+                    CHIP_PATH: requests[0],
+                    "/dev/gpiochip1": requests[1],
+                }
+                requests[0].__exit__.assert_not_called()
+    assert [c.args[0] for c in mock_request.call_args_list] == [
+        CHIP_PATH,
+        "/dev/gpiochip1",
+    ]
+    for request in requests:
+        request.__exit__.assert_called_once()
+
+
+def test_request_lines_failure():
+    """Test that lines already requested are released on failure."""
+    SensorPort("S0", "P1", 1, 17, True)
+    ActuatorPort("Bell", "A3", 1, 5, True, "/dev/gpiochip1")
+    first = MagicMock()
+    first.__enter__.return_value = first
+    with patch(
+        "alarmd.port.gpiod.request_lines", side_effect=[first, OSError]
+    ):
+        with pytest.raises(OSError):
+            Port.request_lines(watch=False)
+    first.__exit__.assert_called_once()
+    assert not Port.requests
+
+
+def test_watch_line_values():
+    """Test that a single watcher serves the requests of all chips."""
+    SensorPort("S0", "P1", 1, 17, True)
+    SensorPort("S1", "P1", 2, 17, True, "/dev/gpiochip1")
+    SensorPort.set_sensor_event("*", "ActiveSensor")
+    read_fd0, write_fd0 = os.pipe()
+    read_fd1, write_fd1 = os.pipe()
+
+    def make_request(fd):
+        def read_edge_events(_max_events):
+            os.read(fd, 1)
+            return [MagicMock(line_offset=17, timestamp_ns=fd)]
+
+        return MagicMock(fd=fd, read_edge_events=read_edge_events)
+
+    requests = {
+        CHIP_PATH: make_request(read_fd0),
+        "/dev/gpiochip1": make_request(read_fd1),
+    }
+    handled = []
+
+    def handle_edge_events(edge_events, chip):
+        handled.append((edge_events[0].timestamp_ns, chip))
+        if len(handled) == 2:
+            raise StopIteration
+
+    os.write(write_fd1, b"x")
+    os.write(write_fd0, b"x")
+    with patch.object(
+        SensorPort, "handle_edge_events", side_effect=handle_edge_events
+    ):
+        with pytest.raises(StopIteration):
+            SensorPort.watch_line_values(requests)
+    for fd in [read_fd0, write_fd0, read_fd1, write_fd1]:
+        os.close(fd)
+    assert sorted(handled) == sorted(
+        [(read_fd0, CHIP_PATH), (read_fd1, "/dev/gpiochip1")]
+    )
+
+
+def test_set_bits_validation():
+    """Test that no port is set if a name isn't an actuator's."""
+    siren = ActuatorPort("Siren", "A1", 29, 5, True)
+    sensor = SensorPort("Entrance", "S02", 26, 7, True)
+    siren.set_value(0)
+    sensor.set_emulated_value(0)
+    with pytest.raises(TypeError):
+        ActuatorPort.set_bits({"Siren": 1, "Entrance": 1})
+    with pytest.raises(ValueError):
+        ActuatorPort.set_bits({"Siren": 1, "Unknown": 1})
+    assert siren.get_emulated_value() == 0
+    assert sensor.get_value() == 0
+
+    Port.set_emulated(False)
+    request = MagicMock()
+    with patch.dict(Port.requests, {CHIP_PATH: request}):
+        with patch("alarmd.port.syslog_worker.log") as mock_syslog:
+            with pytest.raises(TypeError):
+                ActuatorPort.set_bits({"Siren": 1, "Entrance": 1})
+    mock_syslog.assert_not_called()
+    request.set_values.assert_not_called()
+
+
+def edge(line_offset, timestamp_ms, rising=True):
+    """Return an edge event of the specified line and time."""
+    return MagicMock(
+        line_offset=line_offset,
+        timestamp_ns=timestamp_ms * 1_000_000,
+        event_type=(
+            port.gpiod.EdgeEvent.Type.RISING_EDGE
+            if rising
+            else port.gpiod.EdgeEvent.Type.FALLING_EDGE
+        ),
+    )
+
+
+def test_line_config_options():
+    pir = SensorPort("Pir", "S02", 26, 7, "1", debounce=1, holdoff=30)
+    door = SensorPort("Door", "S03", 27, 8, "1", edge="falling")
+    contact = SensorPort("Contact", "S04", 28, 9, "1", min_pulse=0.05)
+    settings = pir.gpiod_line_config()[7]
+    assert settings.debounce_period.total_seconds() == 1
+    assert settings.edge_detection == port.gpiod.line.Edge.RISING
+    settings = door.gpiod_line_config()[8]
+    assert settings.edge_detection == port.gpiod.line.Edge.FALLING
+    assert settings.debounce_period.total_seconds() == 0.2
+    settings = contact.gpiod_line_config()[9]
+    assert settings.edge_detection == port.gpiod.line.Edge.BOTH
+    assert list(Port.sensor_filtering) == [1, 0, 1]
+    with pytest.raises(ValueError):
+        SensorPort("Bad", "S05", 29, 10, "1", edge="both", min_pulse=1)
+
+
+def test_min_pulse_filter():
+    SensorPort("Contact", "S04", 28, 9, "1", min_pulse=0.05)
+    SensorPort.set_sensor_event("Contact", "ActiveSensor")
+    edge_events = [
+        # Glitch
+        edge(9, 0),
+        edge(9, 10, rising=False),
+        # Pulse ending without a start
+        edge(9, 15, rising=False),
+        # Valid pulse
+        edge(9, 100),
+        edge(9, 200, rising=False),
+    ]
+    with patch("alarmd.port.event_queue") as mock_queue:
+        SensorPort.handle_edge_events(edge_events)
+    events = mock_queue.put_batch.call_args.args[0]
+    assert events == ["ActiveSensor"]
+    # Timestamped with the pulse's start
+    assert events[0].timestamp_ns == 100_000_000
+    assert Port.get_instance_by_name("Contact").get_filtered_count() == 1
+
+
+def test_holdoff_filter():
+    SensorPort("Pir", "S02", 26, 7, "1", holdoff=1)
+    SensorPort("Hall", "S03", 27, 8, "1")
+    SensorPort.set_sensor_event("*", "ActiveSensor")
+    edge_events = [
+        edge(7, 0),
+        edge(7, 500),
+        edge(8, 600),
+        edge(8, 700),
+        edge(7, 999),
+        edge(7, 1000),
+    ]
+    with patch("alarmd.port.event_queue") as mock_queue:
+        SensorPort.handle_edge_events(edge_events)
+    events = mock_queue.put_batch.call_args.args[0]
+    assert [(e.line_offset, e.timestamp_ns // 1_000_000) for e in events] == [
+        (7, 0),
+        (8, 600),
+        (8, 700),
+        (7, 1000),
+    ]
+    assert Port.get_instance_by_name("Pir").get_filtered_count() == 2
+
+
+def test_status_file(tmp_path):
+    """Test that the status is written as a single document."""
+    status_path = str(tmp_path / "status.json")
+    Port.set_status_path(status_path)
+    sensors = [SensorPort(f"S{i}", "P1", i, 17 + i, True) for i in range(3)]
+    SensorPort.set_sensor_event("*", "AlarmTriggered")
+    sensors[1].set_emulated_value(1)
+    with patch("alarmd.port.open") as mock_port_open:
+        SensorPort.increment_sensors()
+    mock_port_open.assert_not_called()
+    with open(status_path, encoding="utf-8") as status_file:
+        status = json.load(status_file)
+    assert status["sensors"]["S0"] == [0, None]
+    count, fired = status["sensors"]["S1"]
+    assert count == 1
+    assert fired == pytest.approx(time.time(), abs=10)
+    assert not os.path.exists(status_path + ".tmp")
+
+    with patch("alarmd.port.os.remove") as mock_remove:
+        SensorPort.zero_sensors()
+    mock_remove.assert_not_called()
+    with open(status_path, encoding="utf-8") as status_file:
+        status = json.load(status_file)
+    assert status["sensors"]["S1"] == [0, None]
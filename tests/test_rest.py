@@ -5,6 +5,7 @@ from unittest.mock import patch, call
 from alarmd import debug, state
 from alarmd.port import ActuatorPort, Port, SensorPort
 from alarmd.rest import app
+from alarmd.disabled import DisabledSensors
 from alarmd.dsl import read_config
 from alarmd.state import State
 
@@ -120,3 +121,234 @@ def test_sensor_route(client):
 
         response = client.get("/sensor/Siren5")
         assert response.status_code == 404
+
+
+def test_trace_route(client):
+    mock_file = StringIO(
+        SETUP
+        + """
+initial:
+    > DONE
+    ;
+    """
+    )
+    initial_name = read_config(mock_file)
+    State.event_processor(initial_name)
+
+    response = client.get("/trace")
+    assert response.status_code == 200
+    assert len(response.json["trace"]) == 1
+    assert response.json["trace"][0]["to"] == "DONE"
+
+
+def test_disabled_route(client, tmp_path):
+    (tmp_path / "Entrance").touch()
+    with patch("alarmd.rest.disabled_sensors.path", str(tmp_path)):
+        response = client.get("/disabled")
+    assert response.status_code == 200
+    assert response.json == {"disabled": ["Entrance"]}
+
+
+def test_syslog_route(client):
+    response = client.get("/syslog")
+    assert response.status_code == 200
+    assert set(response.json) == {"logged", "suppressed", "dropped", "queued"}
+
+
+def test_access_check(client):
+    State.state = State("idle")
+    for address, status in [
+        ("127.0.0.1", 200),
+        ("<local>", 200),
+        ("192.168.1.10", 403),
+    ]:
+        response = client.get(
+            "/state", environ_base={"REMOTE_ADDR": address}
+        )
+        assert response.status_code == status
+
+
+def read_events(response, count):
+    """Return the specified number of events from a streamed response."""
+    events = []
+    for chunk in response.response:
+        if not chunk.startswith(b":"):
+            events.append(chunk.decode())
+        if len(events) == count:
+            break
+    response.close()
+    return events
+
+
+def test_stream_route(client):
+    mock_file = StringIO(
+        SETUP
+        + """
+*:
+    CmdSecond > second
+    ;
+
+initial:
+    CmdOther > second
+    ;
+
+second:
+    > DONE
+    ;
+    """
+    )
+    initial_name = read_config(mock_file)
+    state.event_queue.put("CmdSecond")
+    State.event_processor(initial_name)
+
+    response = client.get("/stream?last_id=0", buffered=False)
+    assert response.mimetype == "text/event-stream"
+    events = read_events(response, 2)
+    assert events[0].startswith(
+        'id: 1\nevent: transition\ndata: {"time": '
+    )
+    assert events[0].endswith(
+        '"event": "CmdSecond", "from": "initial", "to": "second"}\n\n'
+    )
+    assert events[1].startswith("id: 2\n")
+    assert '"event": null, "from": "second", "to": "DONE"' in events[1]
+
+    # Resumption
+    response = client.get(
+        "/stream", headers={"Last-Event-ID": "1"}, buffered=False
+    )
+    assert read_events(response, 1)[0].startswith("id: 2\n")
+
+    response = client.get("/stream?last_id=x")
+    assert response.status_code == 400
+
+
+def test_stream_sensors(client):
+    mock_file = StringIO(SENSOR_SETUP)
+    read_config(mock_file)
+    state.broadcaster.publish("sensor", {"sensor": "Bedroom", "event": "a"})
+    state.broadcaster.publish("transition", {})
+    response = client.get("/stream?last_id=0", buffered=False)
+    assert read_events(response, 1)[0].startswith("id: 2\nevent: transition")
+    response = client.get("/stream?last_id=0&sensors=1", buffered=False)
+    assert read_events(response, 1)[0] == (
+        'id: 1\nevent: sensor\ndata: {"sensor": "Bedroom", "event": "a"}\n\n'
+    )
+
+
+def test_ports_route(client, tmp_path):
+    read_config(StringIO(SETUP + SENSOR_SETUP))
+    Port.set_emulated(True)
+    Port.get_instance_by_name("Window").set_emulated_value(1)
+    Port.get_instance_by_name("Bedroom").set_emulated_value(0)
+    Port.get_instance_by_name("Siren6").set_value(1)
+    SensorPort.set_sensor_event("Window", "WindowOpen")
+    Port.get_instance_by_name("Window").increment_count()
+    disabled = DisabledSensors(tmp_path)
+    (tmp_path / "Bedroom").touch()
+
+    with patch("alarmd.port.disabled_sensors", disabled), patch.object(
+        SensorPort, "read_values", wraps=SensorPort.read_values
+    ) as mock_read:
+        response = client.get("/ports")
+    assert response.status_code == 200
+    assert response.json == {
+        "ports": [
+            {
+                "name": "Siren5",
+                "type": "actuator",
+                "value": 0,
+                "event": None,
+                "count": None,
+                "disabled": None,
+            },
+            {
+                "name": "Siren6",
+                "type": "actuator",
+                "value": 1,
+                "event": None,
+                "count": None,
+                "disabled": None,
+            },
+            {
+                "name": "Bedroom",
+                "type": "sensor",
+                "value": 0,
+                "event": None,
+                "count": 0,
+                "disabled": True,
+            },
+            {
+                "name": "Window",
+                "type": "sensor",
+                "value": 1,
+                "event": "WindowOpen",
+                "count": 1,
+                "disabled": False,
+            },
+        ]
+    }
+    # A single bulk read for all sensors
+    mock_read.assert_called_once()
+
+    with patch("alarmd.port.disabled_sensors", disabled):
+        response = client.get("/ports?type=actuator&name=Siren6")
+        assert [p["name"] for p in response.json["ports"]] == ["Siren6"]
+
+        response = client.get("/sensors?name=Window&name=Siren5")
+        assert list(response.json) == ["sensors"]
+        assert [p["name"] for p in response.json["sensors"]] == ["Window"]
+
+        response = client.get("/ports?type=relay")
+        assert response.status_code == 400
+
+
+def test_command_batch_route(client):
+    mock_file = StringIO(
+        SETUP
+        + """
+*:
+    CmdSecond > second
+    CmdOther > other
+    ;
+
+initial:
+    quit > DONE
+    ;
+
+second:
+    | set_bit('Siren6', 0)
+    CmdQuit > DONE
+    ;
+
+other:
+    | set_bit('Siren6', 1)
+    ;
+    """
+    )
+    with patch.object(ActuatorPort, "set_value") as mock_set_value:
+        initial_name = read_config(mock_file)
+
+        for body in [None, {}, {"commands": []}, {"commands": ["Other", 1]}]:
+            response = client.post("/cmd", json=body)
+            assert response.status_code == 400
+
+        # Nothing is queued if any command is unknown
+        response = client.post(
+            "/cmd", json={"commands": ["Other", "NonExistent"]}
+        )
+        assert response.status_code == 404
+        assert state.event_queue.empty()
+
+        response = client.post(
+            "/cmd", json={"commands": ["Other", "Second", "Other"]}
+        )
+        assert response.status_code == 200
+        assert response.json == {
+            "queued": ["CmdOther", "CmdSecond", "CmdOther"]
+        }
+        state.event_queue.put("quit")
+
+        State.event_processor(initial_name)
+        mock_set_value.assert_has_calls([call(1), call(0), call(1)])
+        assert state.event_queue.get_all() == []
@@ -0,0 +1,76 @@
+import http.client
+import os
+import stat
+import threading
+
+import pytest
+
+from alarmd.benchmark import UnixHTTPConnection
+from alarmd.port import Port
+from alarmd.rest import app
+from alarmd.server import PooledWSGIServer, make_server
+from alarmd.state import State
+
+
+@pytest.fixture(autouse=True)
+def reset_globals():
+    State.reset()
+    Port.reset()
+    State.state = State("idle")
+
+
+def serve(server):
+    """Run the specified server in a thread, returning the thread."""
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    return thread
+
+
+def stop(server, thread):
+    server.shutdown()
+    thread.join()
+    server.server_close()
+
+
+def get(connection, url):
+    connection.request("GET", url)
+    response = connection.getresponse()
+    return response.status, response.read()
+
+
+def test_pooled_server_tcp():
+    server = PooledWSGIServer("127.0.0.1", 0, app, threads=2)
+    thread = serve(server)
+    try:
+        results = []
+
+        def client():
+            connection = http.client.HTTPConnection("127.0.0.1", server.port)
+            # Two requests on a persistent connection
+            results.append(get(connection, "/state"))
+            results.append(get(connection, "/state"))
+            connection.close()
+
+        clients = [threading.Thread(target=client) for _ in range(4)]
+        for client_thread in clients:
+            client_thread.start()
+        for client_thread in clients:
+            client_thread.join()
+    finally:
+        stop(server, thread)
+    assert results == [(200, b'{"state":"idle"}\n')] * 8
+    assert server.executor._max_workers == 2
+
+
+def test_pooled_server_unix_socket(tmp_path):
+    path = str(tmp_path / "alarm.sock")
+    server = make_server(app, threads=2, socket_path=path)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o660
+    thread = serve(server)
+    try:
+        connection = UnixHTTPConnection(path)
+        # Unix socket clients pass the access check
+        assert get(connection, "/state") == (200, b'{"state":"idle"}\n')
+        connection.close()
+    finally:
+        stop(server, thread)
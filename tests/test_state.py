@@ -1,12 +1,14 @@
 import pytest
+from contextlib import contextmanager
 from io import StringIO
-from unittest.mock import patch, call
+from unittest.mock import MagicMock, patch, call
 import sys
 
 from alarmd.dsl import read_config
-from alarmd.event_queue import event_queue
+from alarmd.event_queue import Event, event_queue
 from alarmd.port import Port
-from alarmd.state import State
+from alarmd.state import BatchStatistics, State
+from alarmd.timer import timer_scheduler
 from alarmd import debug
 
 
@@ -39,6 +41,25 @@ SENSOR	    S07	40	82	1	Window
 """
 
 
+@contextmanager
+def patch_port(port, method, **kwargs):
+    """
+    Patch the specified method of a single port; ports have no
+    instance dictionary, so their class's method is patched
+    to dispatch the port's calls to the returned mock.
+    """
+    mock = MagicMock(**kwargs)
+    original = getattr(type(port), method)
+
+    def dispatch(self, *args, **kwargs):
+        if self is port:
+            return mock(*args, **kwargs)
+        return original(self, *args, **kwargs)
+
+    with patch.object(type(port), method, dispatch):
+        yield mock
+
+
 @pytest.fixture(autouse=True)
 def reset_globals():
     """Fixture to reset global variables before each test."""
@@ -59,9 +80,9 @@ initial:
     initial_name = read_config(mock_file)
     siren5 = Port.get_instance_by_name("Siren5")
     siren6 = Port.get_instance_by_name("Siren6")
-    with patch.object(
+    with patch_port(
         siren5, "set_value"
-    ) as mock_siren5_set_value, patch.object(
+    ) as mock_siren5_set_value, patch_port(
         siren6, "set_value"
     ) as mock_siren6_set_value:
         State.event_processor(initial_name)
@@ -91,9 +112,9 @@ other:
     initial_name = read_config(mock_file)
     siren5 = Port.get_instance_by_name("Siren5")
     siren6 = Port.get_instance_by_name("Siren6")
-    with patch.object(
+    with patch_port(
         siren5, "set_value"
-    ) as mock_siren5_set_value, patch.object(
+    ) as mock_siren5_set_value, patch_port(
         siren6, "set_value"
     ) as mock_siren6_set_value:
         State.event_processor(initial_name)
@@ -124,9 +145,9 @@ other:
     initial_name = read_config(mock_file)
     siren5 = Port.get_instance_by_name("Siren5")
     siren6 = Port.get_instance_by_name("Siren6")
-    with patch.object(
+    with patch_port(
         siren5, "set_value"
-    ) as mock_siren5_set_value, patch.object(
+    ) as mock_siren5_set_value, patch_port(
         siren6, "set_value"
     ) as mock_siren6_set_value:
         event_queue.put("go_second")
@@ -152,7 +173,7 @@ trampoline:
     )
     initial_name = read_config(mock_file)
     siren5 = Port.get_instance_by_name("Siren5")
-    with patch.object(siren5, "set_value") as mock_siren5_set_value:
+    with patch_port(siren5, "set_value") as mock_siren5_set_value:
         event_queue.put("repeat")
         event_queue.put("repeat")
         event_queue.put("repeat")
@@ -178,7 +199,7 @@ trampoline:
     )
     initial_name = read_config(mock_file)
     siren5 = Port.get_instance_by_name("Siren5")
-    with patch.object(siren5, "set_value") as mock_siren5_set_value:
+    with patch_port(siren5, "set_value") as mock_siren5_set_value:
         event_queue.put("repeat")
         event_queue.put("repeat")
         event_queue.put("repeat")
@@ -203,7 +224,7 @@ trampoline:
     )
     initial_name = read_config(mock_file)
     siren5 = Port.get_instance_by_name("Siren5")
-    with patch.object(siren5, "set_value") as mock_siren5_set_value:
+    with patch_port(siren5, "set_value") as mock_siren5_set_value:
         event_queue.put("repeat")
         event_queue.put("repeat")
         event_queue.put("repeat")
@@ -236,9 +257,9 @@ other:
     initial_name = read_config(mock_file)
     siren5 = Port.get_instance_by_name("Siren5")
     siren6 = Port.get_instance_by_name("Siren6")
-    with patch.object(
+    with patch_port(
         siren5, "set_value"
-    ) as mock_siren5_set_value, patch.object(
+    ) as mock_siren5_set_value, patch_port(
         siren6, "set_value"
     ) as mock_siren6_set_value:
         State.event_processor(initial_name)
@@ -269,9 +290,9 @@ other:
     initial_name = read_config(mock_file)
     siren5 = Port.get_instance_by_name("Siren5")
     siren6 = Port.get_instance_by_name("Siren6")
-    with patch.object(
+    with patch_port(
         siren5, "set_value"
-    ) as mock_siren5_set_value, patch.object(
+    ) as mock_siren5_set_value, patch_port(
         siren6, "set_value"
     ) as mock_siren6_set_value:
         event_queue.put("go_second")
@@ -298,9 +319,9 @@ called:
     initial_name = read_config(mock_file)
     siren5 = Port.get_instance_by_name("Siren5")
     siren6 = Port.get_instance_by_name("Siren6")
-    with patch.object(
+    with patch_port(
         siren5, "set_value"
-    ) as mock_siren5_set_value, patch.object(
+    ) as mock_siren5_set_value, patch_port(
         siren6, "set_value"
     ) as mock_siren6_set_value:
         State.event_processor(initial_name)
@@ -326,7 +347,7 @@ trampoline:
     )
     initial_name = read_config(mock_file)
     siren5 = Port.get_instance_by_name("Siren5")
-    with patch.object(siren5, "set_value") as mock_siren5_set_value:
+    with patch_port(siren5, "set_value") as mock_siren5_set_value:
         event_queue.put("repeat")
         event_queue.put("repeat")
         event_queue.put("done")
@@ -399,7 +420,7 @@ zero:
     )
     initial_name = read_config(mock_file)
     bedroom = Port.get_instance_by_name("Bedroom")
-    with patch.object(bedroom, "get_value", return_value=1) as mock_get_value:
+    with patch_port(bedroom, "get_value", return_value=1) as mock_get_value:
         assert bedroom.get_count() == 0
         State.event_processor(initial_name)
         assert bedroom.is_event_generating()
@@ -409,3 +430,165 @@ zero:
         mock_get_value.assert_called_once()
         State.event_processor("zero")
         assert Port.get_instance_by_name("Bedroom").get_count() == 0
+
+
+def test_finalize_dispatch_table():
+    mock_file = StringIO(
+        SETUP
+        + """
+*:
+    CmdDisarm > DONE
+    ;
+
+initial:
+    go_second > second
+    CmdDisarm > second
+    ;
+
+second:
+    > DONE
+    ;
+    """
+    )
+    read_config(mock_file)
+    initial = State.get_instance_by_name("initial")
+    second = State.get_instance_by_name("second")
+    done = State.get_instance_by_name("DONE")
+
+    state_ids = [s.state_id for s in State.states_by_name.values()]
+    assert sorted(state_ids) == list(range(len(State.states_by_name)))
+    assert len(initial.transitions) == len(State.event_ids)
+
+    assert initial.process_event("go_second") is second
+    # Transitions common to all states take precedence
+    assert initial.process_event("CmdDisarm") is done
+    assert second.process_event("CmdDisarm") is done
+    assert initial.process_event("NonExistent") is None
+    assert not initial.has_direct_transition()
+    assert second.has_direct_transition()
+    assert second.process_event(None) is done
+
+
+def test_unhandled_event():
+    mock_file = StringIO(
+        SETUP
+        + """
+initial:
+    go_second > second
+    ;
+
+second:
+    | set_bit('Siren6', 0)
+    > DONE
+    ;
+    """
+    )
+    initial_name = read_config(mock_file)
+    siren6 = Port.get_instance_by_name("Siren6")
+    with patch_port(siren6, "set_value") as mock_siren6_set_value:
+        event_queue.put("unknown")
+        event_queue.put("go_second")
+        State.event_processor(initial_name)
+        mock_siren6_set_value.assert_has_calls([call(0)])
+
+
+def test_timer_cancelled_on_exit():
+    mock_file = StringIO(
+        SETUP
+        + """
+initial:
+    go_second > second
+    100s > DONE
+    ;
+
+second:
+    > DONE
+    ;
+    """
+    )
+    initial_name = read_config(mock_file)
+    timer_scheduler.reset()
+    event_queue.put("go_second")
+    State.event_processor(initial_name)
+    assert timer_scheduler.get_counters() == {
+        "pending": 0,
+        "fired": 0,
+        "cancelled": 1,
+    }
+
+
+def test_batch_processing():
+    mock_file = StringIO(
+        SETUP
+        + """
+initial:
+    |=1 set_bit('Siren5', 1)
+    repeat > trampoline
+    done > DONE
+    ;
+
+trampoline:
+    > initial
+    ;
+    """
+    )
+    initial_name = read_config(mock_file)
+    siren5 = Port.get_instance_by_name("Siren5")
+    State.batch_statistics = BatchStatistics()
+    with patch_port(siren5, "set_value") as mock_siren5_set_value:
+        event_queue.put("repeat")
+        event_queue.put("repeat")
+        event_queue.put("done")
+        event_queue.put("left")
+        State.event_processor(initial_name, batching=True)
+        mock_siren5_set_value.assert_called_once_with(1)
+    assert State.get_instance_by_name("initial").counter == 3
+    counters = State.batch_statistics.get_counters()
+    assert counters["batches"] == 1
+    assert counters["events"] == 4
+    assert counters["max_size"] == 4
+    # Events after DONE remain queued
+    assert event_queue.get_all() == ["left"]
+
+
+def test_trace():
+    mock_file = StringIO(
+        SETUP
+        + """
+initial:
+    go_second > second
+    ;
+
+second:
+    > DONE
+    ;
+    """
+    )
+    initial_name = read_config(mock_file)
+    State.trace_buffer.reset()
+    event_queue.put("unknown")
+    event_queue.put("go_second")
+    State.event_processor(initial_name)
+    trace = State.get_trace()
+    assert [(r["event"], r["from"], r["to"]) for r in trace] == [
+        ("", "initial", "initial"),
+        ("go_second", "initial", "second"),
+        (None, "second", "DONE"),
+    ]
+
+
+def test_trace_edge_timestamp():
+    mock_file = StringIO(
+        SETUP
+        + """
+initial:
+    ActiveSensor > DONE
+    ;
+    """
+    )
+    initial_name = read_config(mock_file)
+    State.trace_buffer.reset()
+    event_queue.put(Event("ActiveSensor", timestamp_ns=1234, line_offset=7))
+    State.event_processor(initial_name)
+    (record,) = State.get_trace()
+    assert (record["edge_time"], record["line"]) == (1234, 7)
@@ -0,0 +1,25 @@
+import json
+import os
+from unittest.mock import patch
+
+from alarmd.status import write_document
+
+
+def test_write_document(tmp_path):
+    path = str(tmp_path / "status.json")
+    assert write_document(path, {"a": [1, None]})
+    with open(path, encoding="utf-8") as document:
+        assert document.read() == '{"a":[1,null]}'
+    assert os.listdir(tmp_path) == ["status.json"]
+
+
+def test_write_document_atomic(tmp_path):
+    """Test that a failed write leaves the previous document intact."""
+    path = str(tmp_path / "status.json")
+    write_document(path, {"a": 1})
+    with patch("alarmd.status.os.replace", side_effect=OSError("full")):
+        with patch("alarmd.status.syslog_worker.log") as mock_log:
+            assert not write_document(path, {"a": 2})
+    mock_log.assert_called_once()
+    with open(path, encoding="utf-8") as document:
+        assert json.load(document) == {"a": 1}
@@ -0,0 +1,74 @@
+import syslog
+from unittest.mock import call, patch
+
+from alarmd.syslogger import SyslogWorker
+
+
+def test_deduplication():
+    worker = SyslogWorker(window=10)
+    with patch("alarmd.syslogger.syslog.syslog") as mock_syslog:
+        worker.process((0, syslog.LOG_INFO, "trigger: Kitchen", True), 0)
+        for i in range(1, 6):
+            worker.process((i, syslog.LOG_INFO, "trigger: Kitchen", True), i)
+        worker.process((6, syslog.LOG_INFO, "trigger: Hall", True), 6)
+        assert mock_syslog.call_count == 2
+        worker.process(None, 10)
+    assert mock_syslog.call_args_list == [
+        call(syslog.LOG_INFO, "trigger: Kitchen"),
+        call(syslog.LOG_INFO, "trigger: Hall"),
+        call(syslog.LOG_INFO, "trigger: Kitchen x5 in 10s"),
+    ]
+    assert worker.get_counters() == {
+        "logged": 3,
+        "suppressed": 5,
+        "dropped": 0,
+        "queued": 0,
+    }
+
+
+def test_window_expiry():
+    worker = SyslogWorker(window=10)
+    with patch("alarmd.syslogger.syslog.syslog") as mock_syslog:
+        worker.process((0, syslog.LOG_INFO, "set Siren on", True), 0)
+        worker.process((11, syslog.LOG_INFO, "set Siren on", True), 11)
+    # No summary for a window without repetitions
+    assert mock_syslog.call_count == 2
+    assert worker.suppressed == 0
+
+
+def test_no_window():
+    worker = SyslogWorker(window=0)
+    with patch("alarmd.syslogger.syslog.syslog") as mock_syslog:
+        for i in range(3):
+            worker.process((i, syslog.LOG_INFO, "set Siren on", True), i)
+    assert mock_syslog.call_count == 3
+    assert not worker.windows
+
+
+def test_dropped():
+    worker = SyslogWorker(maxsize=2)
+    # Keep the worker thread from consuming the queue
+    worker.thread = True
+    assert worker.log(syslog.LOG_INFO, "one")
+    assert worker.log(syslog.LOG_INFO, "two")
+    assert not worker.log(syslog.LOG_INFO, "three")
+    assert worker.get_counters()["dropped"] == 1
+    assert worker.get_counters()["queued"] == 2
+    worker.reset()
+    assert worker.get_counters()["queued"] == 0
+
+
+def test_no_deduplication():
+    """Test that state changes are logged in order."""
+    worker = SyslogWorker(window=10)
+    with patch("alarmd.syslogger.syslog.syslog") as mock_syslog:
+        for i, setting in enumerate(["on", "off", "on"]):
+            record = (i, syslog.LOG_INFO, f"set Siren {setting}", False)
+            worker.process(record, i)
+        worker.process(None, 20)
+    assert mock_syslog.call_args_list == [
+        call(syslog.LOG_INFO, "set Siren on"),
+        call(syslog.LOG_INFO, "set Siren off"),
+        call(syslog.LOG_INFO, "set Siren on"),
+    ]
+    assert worker.suppressed == 0
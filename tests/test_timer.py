@@ -0,0 +1,58 @@
+import queue
+from time import sleep
+
+import pytest
+
+from alarmd.timer import Timer, TimerScheduler
+
+
+@pytest.fixture
+def scheduler():
+    """Fixture for a scheduler delivering events to a private queue."""
+    return TimerScheduler(queue.Queue())
+
+
+def test_timer_fires(scheduler):
+    timer = scheduler.schedule(0.01, "TIMER_0.01")
+    assert scheduler.queue.get(timeout=5) == "TIMER_0.01"
+    assert timer.state == Timer.FIRED
+    assert scheduler.get_counters() == {
+        "pending": 0,
+        "fired": 1,
+        "cancelled": 0,
+    }
+
+
+def test_timer_order(scheduler):
+    scheduler.schedule(0.05, "late")
+    scheduler.schedule(0.01, "early")
+    scheduler.schedule(0.01, "early2")
+    assert scheduler.queue.get(timeout=5) == "early"
+    assert scheduler.queue.get(timeout=5) == "early2"
+    assert scheduler.queue.get(timeout=5) == "late"
+
+
+def test_timer_cancel(scheduler):
+    scheduler.schedule(0.05, "cancelled", owner="a")
+    scheduler.schedule(0.05, "cancelled", owner="a")
+    scheduler.schedule(0.1, "kept", owner="b")
+    assert scheduler.cancel("a") == 2
+    assert scheduler.cancel("a") == 0
+    assert scheduler.get_counters() == {
+        "pending": 1,
+        "fired": 0,
+        "cancelled": 2,
+    }
+    assert scheduler.queue.get(timeout=5) == "kept"
+    sleep(0.1)
+    assert scheduler.queue.empty()
+
+
+def test_timer_expire(scheduler):
+    scheduler.heap.clear()
+    timer = Timer(10, "TIMER_10", None)
+    scheduler.heap.append((10, 0, timer))
+    scheduler.pending = 1
+    assert scheduler.expire(5) == ([], 10)
+    assert scheduler.expire(10) == (["TIMER_10"], None)
+    assert scheduler.get_counters()["fired"] == 1
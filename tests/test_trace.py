@@ -0,0 +1,26 @@
+from alarmd.trace import TraceBuffer
+
+
+def test_trace_records():
+    trace = TraceBuffer(4)
+    assert trace.get_records() == []
+    trace.record(1, 2, 3)
+    records = trace.get_records()
+    assert len(records) == 1
+    assert records[0][1:] == (1, 2, 3, 0, -1)
+
+
+def test_trace_edge():
+    trace = TraceBuffer(4)
+    trace.record(1, 2, 3, 1234567890123, 7)
+    assert trace.get_records()[0][1:] == (1, 2, 3, 1234567890123, 7)
+
+
+def test_trace_wraparound():
+    trace = TraceBuffer(4)
+    for i in range(10):
+        trace.record(i, 0, 0)
+    records = trace.get_records()
+    assert [r[1] for r in records] == [6, 7, 8, 9]
+    timestamps = [r[0] for r in records]
+    assert timestamps == sorted(timestamps)